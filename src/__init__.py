@@ -1,3 +1,5 @@
+from .checkpoint import checkpoint_postgres, checkpoint_sqlite
 from .extract import extract_mongodb, extract_postgres
 from .load import load_postgres
 from .transform import transform_to_postgres
+from .utils import schema_profiler, table_metadata_cache
@@ -0,0 +1,112 @@
+# pylint: disable=import-error, no-name-in-module, attribute-defined-outside-init, duplicate-code
+from datetime import datetime
+
+from psycopg2 import connect
+
+from .interface.checkpoint_interface import CheckpointInterface
+
+
+class PostgresCheckpointStore(CheckpointInterface):
+    """
+    Store pipeline checkpoints in a Postgres state table
+    # Kwargs arguments
+    ## Required
+    - host
+    - port
+    - user
+    - password
+    - database
+
+    ## Optional
+    - checkpoint_table: str = "public.etl_checkpoints"
+    """
+
+    def get_checkpoint(self, pipeline_name: str) -> dict:
+        with self.lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(
+                    f"SELECT last_date, last_id FROM {self.checkpoint_table} "
+                    "WHERE pipeline_name = %(pipeline_name)s",
+                    {"pipeline_name": pipeline_name},
+                )
+                row = cursor.fetchone()
+                self.conn.commit()
+            except Exception as exc:
+                self.log.error("Error getting checkpoint: %s", exc)
+                self.conn.rollback()
+                raise exc
+            finally:
+                cursor.close()
+
+        if not row:
+            return None
+
+        return {"last_date": row[0], "last_id": row[1]}
+
+    def save_checkpoint(
+        self, pipeline_name: str, last_date: datetime, last_id: str = None
+    ) -> None:
+        with self.lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(
+                    f"""
+                INSERT INTO {self.checkpoint_table} (pipeline_name, last_date, last_id)
+                VALUES (%(pipeline_name)s, %(last_date)s, %(last_id)s)
+                ON CONFLICT (pipeline_name) DO UPDATE
+                SET last_date = EXCLUDED.last_date,
+                    last_id = EXCLUDED.last_id,
+                    updated_at = now()
+                """,
+                    {
+                        "pipeline_name": pipeline_name,
+                        "last_date": last_date,
+                        "last_id": last_id,
+                    },
+                )
+                self.conn.commit()
+            except Exception as exc:
+                self.log.error("Error saving checkpoint: %s", exc)
+                self.conn.rollback()
+                raise exc
+            finally:
+                cursor.close()
+
+        self.log.info("Checkpoint of %s: %s %s", pipeline_name, last_date, last_id)
+
+    def _get_connection(self, **kwargs) -> None:
+        """
+        Get connection to Postgres and create the state table if needed
+        Kwargs arguments:
+        - host
+        - port
+        - user
+        - password
+        - database
+        - checkpoint_table
+        """
+        self.checkpoint_table = kwargs.get("checkpoint_table", "public.etl_checkpoints")
+        self.conn = connect(
+            host=kwargs["host"],
+            port=kwargs["port"],
+            user=kwargs["user"],
+            password=kwargs["password"],
+            database=kwargs["database"],
+        )
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+            CREATE TABLE IF NOT EXISTS {self.checkpoint_table} (
+                pipeline_name varchar(255) PRIMARY KEY,
+                last_date timestamptz,
+                last_id text,
+                updated_at timestamptz DEFAULT now()
+            )
+            """
+            )
+            self.conn.commit()
+        finally:
+            cursor.close()
@@ -0,0 +1,69 @@
+# pylint: disable=attribute-defined-outside-init, duplicate-code
+import sqlite3
+from datetime import datetime
+
+from .interface.checkpoint_interface import CheckpointInterface
+
+
+class SQLiteCheckpointStore(CheckpointInterface):
+    """
+    Store pipeline checkpoints in a local SQLite file.
+    Stand-in for PostgresCheckpointStore in tests and local runs.
+    # Kwargs arguments
+    ## Optional
+    - path: str = ":memory:"
+    """
+
+    def get_checkpoint(self, pipeline_name: str) -> dict:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_date, last_id FROM etl_checkpoints WHERE pipeline_name = ?",
+                (pipeline_name,),
+            ).fetchone()
+
+        if not row:
+            return None
+
+        last_date = datetime.fromisoformat(row[0]) if row[0] else None
+        return {"last_date": last_date, "last_id": row[1]}
+
+    def save_checkpoint(
+        self, pipeline_name: str, last_date: datetime, last_id: str = None
+    ) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+            INSERT INTO etl_checkpoints (pipeline_name, last_date, last_id)
+            VALUES (?, ?, ?)
+            ON CONFLICT (pipeline_name) DO UPDATE
+            SET last_date = excluded.last_date, last_id = excluded.last_id
+            """,
+                (
+                    pipeline_name,
+                    last_date.isoformat() if last_date else None,
+                    last_id,
+                ),
+            )
+
+        self.log.info("Checkpoint of %s: %s %s", pipeline_name, last_date, last_id)
+
+    def _get_connection(self, **kwargs) -> None:
+        """
+        Open the SQLite file and create the state table if needed
+        Kwargs arguments:
+        - path
+        """
+        # Calls from other threads are serialized by self.lock
+        self.conn = sqlite3.connect(
+            kwargs.get("path", ":memory:"), check_same_thread=False
+        )
+        with self.conn:
+            self.conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS etl_checkpoints (
+                pipeline_name TEXT PRIMARY KEY,
+                last_date TEXT,
+                last_id TEXT
+            )
+            """
+            )
@@ -0,0 +1,76 @@
+# pylint: disable=duplicate-code
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from logging import getLogger
+from threading import Lock
+
+
+class CheckpointInterface(ABC):
+    """
+    This class is used to store the progress of incremental pipelines.
+    For each pipeline it keeps the high-water mark of the delta date column and
+    the last processed _id, saved after each committed batch, so a restart
+    resumes from the last checkpoint instead of scanning the target table.
+    """
+
+    def __init__(self, **kwargs) -> object:
+        self.__start_log()
+
+        # A store can be shared by pipelines running on several threads
+        self.lock = Lock()
+
+        self._get_connection(**kwargs)
+
+    @abstractmethod
+    def get_checkpoint(self, pipeline_name: str) -> dict:
+        """
+        Get the checkpoint of a pipeline as a dict with last_date and last_id,
+        None when the pipeline has no checkpoint yet
+        """
+
+    @abstractmethod
+    def save_checkpoint(
+        self, pipeline_name: str, last_date: datetime, last_id: str = None
+    ) -> None:
+        """
+        Save the checkpoint of a pipeline
+        """
+
+    @abstractmethod
+    def _get_connection(self, **kwargs) -> object:
+        """
+        Get connection to the store
+        Parameters:
+        - **Kwargs parameters are used to get connection
+        """
+
+    def close(self) -> None:
+        """
+        Close connection to the store, it is safe to call more than once
+        """
+        conn = getattr(self, "conn", None)
+        if conn is None:
+            return
+
+        self.conn = None  # pylint: disable=attribute-defined-outside-init
+        conn.close()
+        self.log.info("Connection %s closed", self.__class__.__name__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self.close()
+
+    def __start_log(self) -> None:
+        """
+        Start logging for class
+        """
+        self.log = getLogger(__name__)  # pylint: disable=attribute-defined-outside-init
+        self.log.info("-----------------------------------------")
+        self.log.info("Initializing %s class", self.__class__.__name__)
+        self.log.info("-----------------------------------------")
@@ -1,16 +1,93 @@
 # pylint: disable=import-error, no-name-in-module, too-few-public-methods, attribute-defined-outside-init, protected-access, unused-import
-import json
-from logging import shutdown
-from datetime import datetime
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import partial
+from datetime import datetime, timezone
 
 from pymongo import MongoClient
 
-from bson import decode_all
-from bson.json_util import dumps
+from bson import Code, ObjectId, Regex, Timestamp, decode_all
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
 
 from .interface.extract_interface import ExtractInterface
 
 
+class ObjectIdDecoder(TypeDecoder):
+    """Decode ObjectId as its hex string"""
+
+    bson_type = ObjectId
+
+    def transform_bson(self, value):
+        return str(value)
+
+
+class Decimal128Decoder(TypeDecoder):
+    """Decode Decimal128 as decimal.Decimal"""
+
+    bson_type = Decimal128
+
+    def transform_bson(self, value):
+        return value.to_decimal()
+
+
+class Int64Decoder(TypeDecoder):
+    """Decode 64-bit integers as int"""
+
+    bson_type = Int64
+
+    def transform_bson(self, value):
+        return int(value)
+
+
+class CodeDecoder(TypeDecoder):
+    """Decode javascript Code as its source string"""
+
+    bson_type = Code
+
+    def transform_bson(self, value):
+        return str(value)
+
+
+class RegexDecoder(TypeDecoder):
+    """Decode Regex as its pattern string"""
+
+    bson_type = Regex
+
+    def transform_bson(self, value):
+        return value.pattern
+
+
+class TimestampDecoder(TypeDecoder):
+    """Decode the internal Timestamp type as a UTC datetime"""
+
+    bson_type = Timestamp
+
+    def transform_bson(self, value):
+        return value.as_datetime()
+
+
+# Maps BSON types straight to values psycopg2 can adapt, without the
+# BSON -> extended JSON string -> dict round-trip
+DEFAULT_CODEC_OPTIONS = CodecOptions(
+    tz_aware=True,
+    tzinfo=timezone.utc,
+    uuid_representation=UuidRepresentation.STANDARD,
+    type_registry=TypeRegistry(
+        [
+            ObjectIdDecoder(),
+            Decimal128Decoder(),
+            Int64Decoder(),
+            CodeDecoder(),
+            RegexDecoder(),
+            TimestampDecoder(),
+        ]
+    ),
+)
+
+
 class FromMongodb(ExtractInterface):
     """
     Extract data from Mongodb and return a list of dictionaries
@@ -24,19 +101,20 @@ class FromMongodb(ExtractInterface):
 
     ## Optional
     - last_date: datetime
+    - codec_options: CodecOptions used to decode the raw batches,
+        defaults to DEFAULT_CODEC_OPTIONS
     """
 
-    def extract(  # pylint: disable=dangerous-default-value
-        self,
-        delta_date_columns: list = [],
-        batch_size: int = 10000,
-        last_date: str = None,
-        **kwargs,
-    ) -> list[dict]:
+    def _iter_batches(
+        self, delta_date_columns: list, batch_size: int, last_date: str, **kwargs
+    ) -> Iterator[list[dict]]:
         """
-        Extract data from postgres and return a list of dictionaries
+        Extract data from Mongodb yielding a list of dictionaries per raw batch,
+        so only one decoded batch is held in memory at a time.
         Kwargs arguments:
         - collection
+        - partitions: int, split the scan in ranges read concurrently,
+            see _get_partition_streams
         """
         cursor = self._get_cursor(
             batch_size=batch_size,
@@ -44,15 +122,66 @@ class FromMongodb(ExtractInterface):
             last_date=last_date,
             **kwargs,
         )
-        data = []
+        yield from self._decode_batches(cursor)
+
+    def _decode_batches(self, cursor) -> Iterator[list[dict]]:
+        """
+        Decode each raw batch of the cursor
+        """
         for batch in cursor:
             try:
-                data = json.loads(dumps(decode_all(batch)))
+                data = decode_all(batch, self.codec_options)
             except Exception as exc:
                 self.log.error("Error extracting data: %s", exc)
                 raise RuntimeError(exc) from exc
 
-        return data
+            if not data:
+                continue
+
+            self.log.info("Extracted batch of %s documents from Mongodb", len(data))
+            yield data
+
+    @contextmanager
+    def _get_partition_streams(
+        self, delta_date_columns: list, batch_size: int, last_date: str, **kwargs
+    ) -> Iterator[list[Callable[[], Iterator[list[dict]]]]]:
+        """
+        Split the scan in ranges of partition_field and run the range queries
+        concurrently on threads sharing the MongoClient.
+        Split points are taken from a $sample of the matched documents.
+        Batches arrive in no particular order across ranges.
+        Kwargs arguments:
+        - collection
+        - partitions: int, number of ranges read concurrently
+        - partition_field: str = "_id", field the ranges are split on
+        - split_sample_size: int = 100 * partitions, documents sampled to split
+        """
+        partitions = kwargs.pop("partitions")
+        field = kwargs.pop("partition_field", "_id")
+        sample_size = kwargs.pop("split_sample_size", 100 * partitions)
+
+        split_points = self._get_split_points(
+            collection=kwargs["collection"],
+            field=field,
+            condition=self._get_condition(
+                delta_date_columns=delta_date_columns, last_date=last_date, **kwargs
+            ),
+            partitions=partitions,
+            sample_size=sample_size,
+        )
+
+        producers = []
+        for partition_condition in self._get_partition_conditions(field, split_points):
+            cursor = self._get_cursor(
+                batch_size=batch_size,
+                delta_date_columns=delta_date_columns,
+                last_date=last_date,
+                partition_condition=partition_condition,
+                **kwargs,
+            )
+            producers.append(partial(self._decode_batches, cursor))
+
+        yield producers
 
     def _get_connection(self, **kwargs) -> None:
         """
@@ -64,21 +193,42 @@ class FromMongodb(ExtractInterface):
         - user
         - password
         - database
+        - codec_options
+        - client: MongoClient shared with other extractors, left open on close
         """
+        self.codec_options = kwargs.get("codec_options", DEFAULT_CODEC_OPTIONS)
 
-        if not kwargs["auth"]:
-            self.client = MongoClient(
-                f"""mongodb://{kwargs["host"]}:{kwargs["port"]}/""",
-            )
+        self.owns_client = kwargs.get("client") is None
+        if self.owns_client:
+            self.client = self.get_client(**kwargs)
         else:
-            self.client = MongoClient(
-                f"""mongodb://{kwargs["user"]}:{kwargs["password"]}
-                @{kwargs["host"]}:{kwargs["port"]}/""",
-            )
+            self.client = kwargs["client"]
 
         # Select a database
         self.db = self.client[kwargs["database"]]
 
+    @staticmethod
+    def get_client(**kwargs) -> MongoClient:
+        """
+        Get a MongoClient, it holds its own connection pool and is thread safe,
+        so one client can be shared by every extractor of a run
+        Kwargs arguments:
+        - auth : bool
+        - host
+        - port
+        - user
+        - password
+        """
+        if not kwargs["auth"]:
+            return MongoClient(
+                f"""mongodb://{kwargs["host"]}:{kwargs["port"]}/""",
+            )
+
+        return MongoClient(
+            f"""mongodb://{kwargs["user"]}:{kwargs["password"]}
+            @{kwargs["host"]}:{kwargs["port"]}/""",
+        )
+
     def _get_cursor(
         self, batch_size: int, delta_date_columns: list, last_date: datetime, **kwargs
     ):
@@ -87,9 +237,91 @@ class FromMongodb(ExtractInterface):
         Kwargs arguments:
         - filter
         - aggregation_clause: dict
+        - last_id: resume after this _id among documents dated last_date
+        - ordered: bool, sort by the first delta date column and _id,
+            so each batch ends on a resumable checkpoint
+        - partition_condition: dict, range of a partitioned scan
+        - columns / exclude_columns: list, fields projected, see _get_projection
         """
-        condition: dict = {}
         agg_clause = kwargs["aggregation_clause"]
+        condition = self._get_condition(
+            delta_date_columns=delta_date_columns, last_date=last_date, **kwargs
+        )
+
+        if kwargs.get("partition_condition"):
+            if condition:
+                condition = {"$and": [condition, kwargs["partition_condition"]]}
+            else:
+                condition = kwargs["partition_condition"]
+
+        sort = None
+        required = []
+        if kwargs.get("ordered") and delta_date_columns:
+            sort = [(delta_date_columns[0], 1), ("_id", 1)]
+            required = [delta_date_columns[0], "_id"]
+
+        projection = self._get_projection(required=required, **kwargs)
+
+        if not agg_clause:
+            cursor = self.db[kwargs["collection"]].find_raw_batches(
+                condition, projection=projection, batch_size=batch_size, sort=sort
+            )
+        else:
+            pipeline = []
+            if condition:
+                pipeline.append({"$match": condition})
+            else:
+                self.log.info("condition is none")
+            if sort:
+                pipeline.append({"$sort": dict(sort)})
+            pipeline.append(agg_clause)
+            if projection:
+                pipeline.append({"$project": projection})
+            cursor = self.db[kwargs["collection"]].aggregate_raw_batches(pipeline)
+
+        return cursor
+
+    def _get_projection(self, required: list = None, **kwargs) -> dict:
+        """
+        Get the projection pushed down from columns or exclude_columns,
+        None returns the whole documents.
+        Mongodb cannot mix inclusions and exclusions, so columns wins and
+        exclude_columns only removes fields from it.
+        Required fields are never excluded.
+        Kwargs arguments:
+        - columns: list
+        - exclude_columns: list
+        """
+        required = required or []
+        columns = kwargs.get("columns")
+        exclude_columns = [
+            column
+            for column in kwargs.get("exclude_columns") or []
+            if column not in required
+        ]
+
+        if columns:
+            projection = {
+                column: 1 for column in columns if column not in exclude_columns
+            }
+            projection.update({column: 1 for column in required})
+            if "_id" not in projection:
+                projection["_id"] = 0
+            return projection
+
+        if exclude_columns:
+            return {column: 0 for column in exclude_columns}
+
+        return None
+
+    def _get_condition(
+        self, delta_date_columns: list, last_date: datetime, **kwargs
+    ) -> dict:
+        """
+        Get the query condition from last_date, last_id and filter
+        """
+        condition: dict = {}
+        last_id = kwargs.get("last_id")
 
         if last_date is not None or kwargs["filter"] is not None:
             condition = {"$or": []}
@@ -99,28 +331,79 @@ class FromMongodb(ExtractInterface):
             for col in delta_date_columns:
                 _list.append({col: {"$gt": last_date}})
 
+            if last_id is not None:
+                if ObjectId.is_valid(last_id):
+                    last_id = ObjectId(last_id)
+                _list.append(
+                    {delta_date_columns[0]: last_date, "_id": {"$gt": last_id}}
+                )
+
             condition["$or"].extend(_list)
 
         if kwargs["filter"] is not None:
             condition["$or"].extend(kwargs["filter"])
 
-        if not agg_clause:
-            cursor = self.db[kwargs["collection"]].find_raw_batches(
-                condition, batch_size=batch_size
-            )
-        elif not condition:
-            self.log.info("condition is none")
-            cursor = self.db[kwargs["collection"]].aggregate_raw_batches([agg_clause])
-        else:
-            cursor = self.db[kwargs["collection"]].aggregate_raw_batches(
-                [{"$match": condition}, agg_clause]
-            )
+        return condition
 
-        return cursor
+    def _get_split_points(  # pylint: disable=too-many-arguments
+        self,
+        collection: str,
+        field: str,
+        condition: dict,
+        partitions: int,
+        sample_size: int,
+    ) -> list:
+        """
+        Get partitions - 1 split points of field from a $sample of the matched documents
+        """
+        pipeline = []
+        if condition:
+            pipeline.append({"$match": condition})
+        pipeline.extend(
+            [
+                {"$sample": {"size": sample_size}},
+                {"$match": {field: {"$ne": None}}},
+                {"$project": {"_id": 0, "value": f"${field}"}},
+                {"$sort": {"value": 1}},
+            ]
+        )
+        values = [doc["value"] for doc in self.db[collection].aggregate(pipeline)]
+
+        split_points = []
+        for i in range(1, partitions):
+            if not values:
+                break
+            value = values[len(values) * i // partitions]
+            if not split_points or value > split_points[-1]:
+                split_points.append(value)
+
+        self.log.info("Split %s.%s at %s", collection, field, split_points)
+        return split_points
 
-    def __del__(self) -> None:
+    def _get_partition_conditions(self, field: str, split_points: list) -> list[dict]:
         """
-        Close connection to Mongodb
+        Get one range condition per partition.
+        The first range also reads documents where field is null or missing.
         """
-        self.client.close()
-        shutdown()
+        if not split_points:
+            return [{}]
+
+        conditions = [{"$or": [{field: {"$lt": split_points[0]}}, {field: None}]}]
+        for lower, upper in zip(split_points, split_points[1:]):
+            conditions.append({field: {"$gte": lower, "$lt": upper}})
+        conditions.append({field: {"$gte": split_points[-1]}})
+
+        return conditions
+
+    def close(self) -> None:
+        """
+        Close connection to Mongodb, a shared client is left open
+        """
+        client = getattr(self, "client", None)
+        if client is None:
+            return
+
+        self.client = None
+        if self.owns_client:
+            client.close()
+            self.log.info("Connection %s closed", self.__class__.__name__)
@@ -1,7 +1,12 @@
 # pylint: disable=import-error, no-name-in-module, too-few-public-methods
-from logging import shutdown
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from functools import partial
 
 from psycopg2 import connect
+from psycopg2.pool import ThreadedConnectionPool
 
 from .interface.extract_interface import ExtractInterface
 
@@ -11,39 +16,328 @@ class FromPostgres(ExtractInterface):
     Extract data from Postgres and return a list of dictionaries
     """
 
-    def extract(  # pylint: disable=dangerous-default-value
-        self,
-        delta_date_columns: list = [],
-        batch_size: int = 10000,
-        last_date: str = None,
-        **kwargs,
-    ) -> list[dict]:
+    def _iter_batches(
+        self, delta_date_columns: list, batch_size: int, last_date: str, **kwargs
+    ) -> Iterator[list[dict]]:
         """
-        Extract data from postgres and return a list of dictionaries
+        Extract data from postgres yielding a list of dictionaries per batch.
+        Rows are fetched from a server-side cursor with fetchmany(batch_size),
+        so only one batch is held in memory at a time.
         Kwargs arguments:
         - schema
         - table
+        - pagination: "cursor" (default) or "keyset", see _iter_keyset_batches
+        - partitions: int, read the cursor mode in concurrent slices,
+            see _get_partition_streams
+        - columns: list, select only these columns
+        - exclude_columns: list, select every column of the table but these
         """
+        if kwargs.get("pagination", "cursor") == "keyset":
+            yield from self._iter_keyset_batches(
+                delta_date_columns=delta_date_columns,
+                batch_size=batch_size,
+                last_date=last_date,
+                **kwargs,
+            )
+            return
+
         select_query = self._get_select_query(
             schema=kwargs["schema"],
             table=kwargs["table"],
             delta_date_columns=delta_date_columns,
             last_date=last_date,
+            columns=self._get_select_columns(**kwargs),
+        )
+
+        yield from self._iter_cursor_batches(
+            conn=self.conn,
+            select_query=select_query,
+            batch_size=batch_size,
+            cursor_name="get_delta_cursor",
         )
 
+    def _is_partitioned(self, **kwargs) -> bool:
+        """
+        Check if the extraction is split in partitions, keyset pagination
+        always reads a single stream
+        """
+        return (
+            super()._is_partitioned(**kwargs)
+            and kwargs.get("pagination", "cursor") != "keyset"
+        )
+
+    def _iter_cursor_batches(
+        self, conn, select_query: str, batch_size: int, cursor_name: str
+    ) -> Iterator[list[dict]]:
+        """
+        Run select_query on a server-side cursor and yield fetchmany(batch_size) batches
+        """
         self.log.info("Executing query: %s", select_query)
 
-        with self.conn.cursor(name="get_delta_cursor") as cursor:
+        with conn.cursor(name=cursor_name) as cursor:
             cursor.itersize = batch_size
             cursor.execute(select_query)
 
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            self.log.info("Extracted %s rows from Postgres", len(rows))
+            columns = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
 
-            data = self._transform_to_dict(rows, columns)
+                # Named cursors only describe the result after the first fetch
+                if columns is None:
+                    columns = [desc[0] for desc in cursor.description]
 
-        return data
+                self.log.info("Extracted batch of %s rows from Postgres", len(rows))
+                yield self._transform_to_dict(rows, columns)
+
+    @contextmanager
+    def _get_partition_streams(
+        self, delta_date_columns: list, batch_size: int, last_date: str, **kwargs
+    ) -> Iterator[list[Callable[[], Iterator[list[dict]]]]]:
+        """
+        Split the scan into ranges read concurrently from a pool of connections.
+        All slices import the snapshot exported by self.conn, so together they
+        read one consistent state of the table.
+        Kwargs arguments:
+        - schema
+        - table
+        - partitions: int, number of slices read concurrently
+        - partition_column: numeric or date column to split by its MIN/MAX range,
+            defaults to ctid block ranges
+        - snapshot: bool = True, read every slice under one exported snapshot
+        """
+        partitions = kwargs["partitions"]
+        snapshot_id = None
+        if kwargs.get("snapshot", True):
+            snapshot_id = self._export_snapshot()
+
+        try:
+            if kwargs.get("partition_column"):
+                conditions = self._get_column_partitions(
+                    schema=kwargs["schema"],
+                    table=kwargs["table"],
+                    column=kwargs["partition_column"],
+                    partitions=partitions,
+                )
+            else:
+                conditions = self._get_ctid_partitions(
+                    schema=kwargs["schema"],
+                    table=kwargs["table"],
+                    partitions=partitions,
+                )
+
+            columns = self._get_select_columns(**kwargs)
+            pool = self._get_pool(size=len(conditions))
+            producers = []
+            for i, condition in enumerate(conditions):
+                select_query = self._get_select_query(
+                    schema=kwargs["schema"],
+                    table=kwargs["table"],
+                    delta_date_columns=delta_date_columns,
+                    last_date=last_date,
+                    partition_condition=condition,
+                    columns=columns,
+                )
+                producers.append(
+                    partial(
+                        self._iter_partition_batches,
+                        pool=pool,
+                        select_query=select_query,
+                        batch_size=batch_size,
+                        cursor_name=f"get_delta_cursor_{i}",
+                        snapshot_id=snapshot_id,
+                    )
+                )
+
+            yield producers
+        finally:
+            if snapshot_id:
+                self.conn.rollback()
+                self.conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+
+    def _iter_partition_batches(  # pylint: disable=too-many-arguments
+        self,
+        pool: ThreadedConnectionPool,
+        select_query: str,
+        batch_size: int,
+        cursor_name: str,
+        snapshot_id: str = None,
+    ) -> Iterator[list[dict]]:
+        """
+        Read one slice on a connection of the pool
+        """
+        conn = pool.getconn()
+        try:
+            if snapshot_id:
+                conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+                with conn.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+
+            yield from self._iter_cursor_batches(
+                conn=conn,
+                select_query=select_query,
+                batch_size=batch_size,
+                cursor_name=cursor_name,
+            )
+        finally:
+            conn.rollback()
+            if snapshot_id:
+                conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+            pool.putconn(conn)
+
+    def _export_snapshot(self) -> str:
+        """
+        Start a repeatable read transaction on self.conn and export its snapshot.
+        The transaction stays open until every slice has imported it.
+        """
+        self.conn.rollback()
+        self.conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT pg_export_snapshot()")
+            snapshot_id = cursor.fetchone()[0]
+
+        self.log.info("Exported snapshot %s", snapshot_id)
+        return snapshot_id
+
+    def _get_ctid_partitions(
+        self, schema: str, table: str, partitions: int
+    ) -> list[str]:
+        """
+        Split the table in ctid block ranges.
+        The last range is open, so rows in pages added meanwhile are not missed.
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                """
+            SELECT pg_relation_size(to_regclass(%(table)s))
+                / current_setting('block_size')::int
+            """,
+                {"table": f"{schema}.{table}"},
+            )
+            blocks = cursor.fetchone()[0]
+
+        bounds = [blocks * i // partitions for i in range(1, partitions)]
+        bounds = sorted(set(bound for bound in bounds if bound > 0))
+
+        conditions = []
+        lower = None
+        for bound in bounds:
+            condition = f"ctid < '({bound},0)'::tid"
+            if lower is not None:
+                condition = f"ctid >= '({lower},0)'::tid and " + condition
+            conditions.append(condition)
+            lower = bound
+
+        conditions.append(
+            f"ctid >= '({lower},0)'::tid" if lower is not None else "true"
+        )
+        return conditions
+
+    def _get_column_partitions(
+        self, schema: str, table: str, column: str, partitions: int
+    ) -> list[str]:
+        """
+        Split the MIN/MAX range of a numeric or date column in equal ranges.
+        The first range also reads NULLs and the last one is open ended.
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"SELECT MIN({column}), MAX({column}) FROM {schema}.{table}")
+            lower, upper = cursor.fetchone()
+
+        if lower is None or lower == upper:
+            return ["true"]
+
+        if not isinstance(lower, (int, float, Decimal, date)):
+            self.log.error("Cannot partition by column %s of %s", column, type(lower))
+            raise ValueError(f"Cannot partition by column {column} of {type(lower)}")
+
+        step = (upper - lower) / partitions
+        bounds = []
+        for i in range(1, partitions):
+            bound = lower + step * i
+            if isinstance(lower, int):
+                bound = int(bound)
+            if not bounds or bound > bounds[-1]:
+                bounds.append(bound)
+
+        conditions = [f"{column} < '{bounds[0]}' or {column} is null"]
+        for lower_bound, upper_bound in zip(bounds, bounds[1:]):
+            conditions.append(
+                f"{column} >= '{lower_bound}' and {column} < '{upper_bound}'"
+            )
+        conditions.append(f"{column} >= '{bounds[-1]}'")
+
+        return conditions
+
+    def _get_select_columns(self, required: list = None, **kwargs) -> list:
+        """
+        Get the select list pushed down from columns or exclude_columns,
+        None selects every column.
+        Required columns are always selected.
+        Kwargs arguments:
+        - schema
+        - table
+        - columns: list
+        - exclude_columns: list
+        """
+        columns = kwargs.get("columns")
+        exclude_columns = kwargs.get("exclude_columns")
+
+        if not columns and not exclude_columns:
+            return None
+
+        if not columns:
+            columns = self._get_table_columns(
+                schema=kwargs["schema"], table=kwargs["table"]
+            )
+
+        exclude_columns = set(exclude_columns or [])
+        select_columns = [column for column in columns if column not in exclude_columns]
+        for column in required or []:
+            if column not in select_columns:
+                select_columns.append(column)
+
+        return select_columns
+
+    def _get_table_columns(self, schema: str, table: str) -> list:
+        """
+        Get the columns of a table in their ordinal position
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                """
+            SELECT attname
+            FROM pg_attribute
+            WHERE attrelid = to_regclass(%(table)s)
+            AND attnum > 0
+            AND NOT attisdropped
+            ORDER BY attnum
+            """,
+                {"table": f"{schema}.{table}"},
+            )
+            columns = [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+        return columns
+
+    def _get_pool(self, size: int) -> ThreadedConnectionPool:
+        """
+        Get the connection pool used by partitioned extraction
+        """
+        # pylint: disable=attribute-defined-outside-init
+        if self.pool is not None and self.pool.maxconn < size:
+            self.pool.closeall()
+            self.pool = None
+
+        if self.pool is None:
+            self.pool = ThreadedConnectionPool(
+                minconn=1, maxconn=size, **self.connection_kwargs
+            )
+
+        return self.pool
 
     # pylint: disable=duplicate-code
     def _get_connection(self, **kwargs) -> None:
@@ -56,47 +350,200 @@ class FromPostgres(ExtractInterface):
         - password
         - database
         """
-        self.conn = connect(  # pylint: disable=attribute-defined-outside-init
-            host=kwargs["host"],
-            port=kwargs["port"],
-            user=kwargs["user"],
-            password=kwargs["password"],
-            database=kwargs["database"],
-        )
+        # pylint: disable=attribute-defined-outside-init
+        self.connection_kwargs = {
+            "host": kwargs["host"],
+            "port": kwargs["port"],
+            "user": kwargs["user"],
+            "password": kwargs["password"],
+            "database": kwargs["database"],
+        }
+        self.conn = connect(**self.connection_kwargs)
+        self.pool = None
 
-    def _get_select_query(
+    def _get_select_query(  # pylint: disable=too-many-arguments
         self,
         schema: str,
         table: str,
         delta_date_columns: list,
         last_date: str = None,
+        partition_condition: str = None,
+        columns: list = None,
     ) -> str:
-        sql_query = f"SELECT * FROM {schema}.{table}"
+        sql_query = f"SELECT {self._get_select_list(columns)} FROM {schema}.{table}"
 
-        if delta_date_columns:
+        if delta_date_columns or partition_condition:
             sql_query = self.__generate_where_clause(
                 select_statment=sql_query,
                 delta_date_columns=delta_date_columns,
                 last_date=last_date,
+                partition_condition=partition_condition,
             )
 
         return sql_query
 
+    def _get_select_list(self, columns: list = None) -> str:
+        """
+        Get the select list of a query, * when no columns are given
+        """
+        if not columns:
+            return "*"
+
+        return ", ".join(columns)
+
     def __generate_where_clause(
-        self, select_statment: str, delta_date_columns: list, last_date=None
+        self,
+        select_statment: str,
+        delta_date_columns: list,
+        last_date=None,
+        partition_condition: str = None,
     ) -> str:
-        if not last_date:
+        conditions = []
+
+        if last_date and delta_date_columns:
+            where_clause = ""
+            for column in delta_date_columns:
+                where_clause += f"{column} >= '{last_date}' or "
+            conditions.append(where_clause[:-4])
+
+        if partition_condition:
+            conditions.append(partition_condition)
+
+        if not conditions:
             return select_statment
 
-        where_clause = " where "
+        if len(conditions) == 1:
+            return select_statment + " where " + conditions[0]
+
+        return select_statment + " where " + " and ".join(f"({c})" for c in conditions)
+
+    def _iter_keyset_batches(
+        self, delta_date_columns: list, batch_size: int, last_date: str, **kwargs
+    ) -> Iterator[list[dict]]:
+        """
+        Page through the table with keyset predicates on (delta_date_column, key_columns).
+        Each batch is a short, index-friendly query committed on its own, so no
+        transaction holds a snapshot for the whole extraction.
+        Without last_date the table is paged by key_columns only.
+        Kwargs arguments:
+        - schema
+        - table
+        - key_columns: list, defaults to the primary key of the table
+        - start_after: tuple of the order column values to resume after
+        - columns / exclude_columns: select list, the order columns are always kept
+        """
+        if delta_date_columns and len(delta_date_columns) > 1:
+            self.log.error("Keyset pagination supports a single delta date column")
+            raise ValueError("Keyset pagination supports a single delta date column")
+
+        key_columns = kwargs.get("key_columns") or self._get_primary_key(
+            schema=kwargs["schema"], table=kwargs["table"]
+        )
+        if not key_columns:
+            self.log.error("Keyset pagination needs key_columns or a primary key")
+            raise ValueError("Keyset pagination needs key_columns or a primary key")
+
+        delta_column = delta_date_columns[0] if delta_date_columns else None
+        order_columns = list(key_columns)
+        if delta_column and last_date:
+            order_columns = [delta_column] + order_columns
+
+        columns = self._get_select_columns(required=order_columns, **kwargs)
+
+        last_key = kwargs.get("start_after")
+        while True:
+            select_query, params = self._get_keyset_query(
+                schema=kwargs["schema"],
+                table=kwargs["table"],
+                order_columns=order_columns,
+                batch_size=batch_size,
+                delta_column=delta_column,
+                last_date=last_date,
+                last_key=last_key,
+                columns=columns,
+            )
+
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(select_query, params)
+                rows = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description]
+            finally:
+                cursor.close()
+                self.conn.commit()
+
+            if not rows:
+                break
+
+            data = self._transform_to_dict(rows, columns)
+            last_key = tuple(data[-1][col] for col in order_columns)
+            self.log.info("Extracted batch of %s rows from Postgres", len(rows))
+            yield data
+
+            if len(rows) < batch_size:
+                break
+
+    def _get_keyset_query(  # pylint: disable=too-many-arguments
+        self,
+        schema: str,
+        table: str,
+        order_columns: list,
+        batch_size: int,
+        delta_column: str = None,
+        last_date: str = None,
+        last_key: tuple = None,
+        columns: list = None,
+    ) -> tuple[str, dict]:
+        """
+        Get the query and parameters of the next keyset page
+        """
+        sql_query = f"SELECT {self._get_select_list(columns)} FROM {schema}.{table}"
+        conditions = []
+        params = {}
+
+        if delta_column and last_date:
+            conditions.append(f"{delta_column} >= %(last_date)s")
+            params["last_date"] = last_date
+
+        if last_key:
+            placeholders = []
+            for i, value in enumerate(last_key):
+                placeholders.append(f"%(key_{i})s")
+                params[f"key_{i}"] = value
+            conditions.append(
+                f"({', '.join(order_columns)}) > ({', '.join(placeholders)})"
+            )
 
-        for column in delta_date_columns:
-            where_clause += f"{column} >= '{last_date}' or "
+        if conditions:
+            sql_query += " WHERE " + " AND ".join(conditions)
 
-        where_clause = where_clause[:-4]
-        select_statment += where_clause
+        sql_query += f" ORDER BY {', '.join(order_columns)} LIMIT {batch_size}"
 
-        return select_statment
+        return sql_query, params
+
+    def _get_primary_key(self, schema: str, table: str) -> list:
+        """
+        Get the primary key columns of a table
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                """
+            SELECT a.attname
+            FROM pg_index i
+            CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, position)
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+            WHERE i.indrelid = to_regclass(%(table)s)
+            AND i.indisprimary
+            ORDER BY k.position
+            """,
+                {"table": f"{schema}.{table}"},
+            )
+            primary_key = [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+        return primary_key
 
     def _transform_to_dict(self, rows: list, columns: list) -> list:
         data = []
@@ -106,7 +553,13 @@ class FromPostgres(ExtractInterface):
 
         return data
 
-    def __del__(self) -> None:
-        self.conn.close()  # pylint: disable=no-member # type: ignore
-        self.log.info("Connection %s closed", self.__class__.__name__)
-        shutdown()
+    def close(self) -> None:
+        """
+        Close the connection and the partition pool
+        """
+        pool = getattr(self, "pool", None)
+        if pool is not None:
+            self.pool = None  # pylint: disable=attribute-defined-outside-init
+            pool.closeall()
+
+        super().close()
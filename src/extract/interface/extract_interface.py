@@ -1,7 +1,12 @@
 # pylint: disable=duplicate-code
 
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager
 from logging import getLogger
+from queue import Full, Queue
+from threading import Event
 
 
 class ExtractInterface(ABC):
@@ -16,17 +21,132 @@ class ExtractInterface(ABC):
 
         self._get_connection(**kwargs)
 
-    @abstractmethod
-    def extract(
+    def extract(  # pylint: disable=dangerous-default-value
         self,
-        delta_date_columns: list,
+        delta_date_columns: list = [],
         batch_size: int = 10000,
         last_date=None,
         **kwargs
     ) -> list[dict]:
         """
-        Extract data from source and return a list of dicts
+        Extract data from source and return a list of dicts,
+        the batches of iter_batches are joined in one list
+        """
+        data = []
+        for batch in self.iter_batches(
+            delta_date_columns=delta_date_columns,
+            batch_size=batch_size,
+            last_date=last_date,
+            **kwargs,
+        ):
+            data.extend(batch)
+
+        self.log.info("Extracted %s rows", len(data))
+
+        return data
+
+    def iter_batches(  # pylint: disable=dangerous-default-value
+        self,
+        delta_date_columns: list = [],
+        batch_size: int = 10000,
+        last_date=None,
+        **kwargs
+    ) -> Iterator[list[dict]]:
+        """
+        Extract data from source yielding a list of dicts per batch.
+        Kwargs arguments:
+        - partitions: int, split the source in slices read concurrently,
+            see _get_partition_streams
+        """
+        if not self._is_partitioned(**kwargs):
+            yield from self._iter_batches(
+                delta_date_columns=delta_date_columns,
+                batch_size=batch_size,
+                last_date=last_date,
+                **kwargs,
+            )
+            return
+
+        with self._get_partition_streams(
+            delta_date_columns=delta_date_columns,
+            batch_size=batch_size,
+            last_date=last_date,
+            **kwargs,
+        ) as producers:
+            yield from self._merge_batch_streams(producers)
+
+    @abstractmethod
+    def _iter_batches(
+        self, delta_date_columns: list, batch_size: int, last_date, **kwargs
+    ) -> Iterator[list[dict]]:
+        """
+        Extract data from source in a single stream, yielding a list of dicts
+        per batch
+        """
+
+    def _is_partitioned(self, **kwargs) -> bool:
+        """
+        Check if the extraction is split in partitions
         """
+        return kwargs.get("partitions", 1) > 1
+
+    @abstractmethod
+    def _get_partition_streams(
+        self, delta_date_columns: list, batch_size: int, last_date, **kwargs
+    ) -> AbstractContextManager[list[Callable[[], Iterator[list[dict]]]]]:
+        """
+        Context manager giving one producer of batches per partition,
+        it stays open while the producers run, see _merge_batch_streams
+        """
+
+    def _merge_batch_streams(
+        self, producers: list[Callable[[], Iterator[list[dict]]]], queue_size: int = 4
+    ) -> Iterator[list[dict]]:
+        """
+        Run each producer on its own thread and yield their batches as they arrive.
+        The bounded queue applies backpressure, so at most queue_size batches wait
+        in memory. The first producer error is raised and stops the others.
+        """
+        batches: Queue = Queue(maxsize=queue_size)
+        stop = Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def run(producer) -> None:
+            try:
+                for batch in producer():
+                    if not put(batch):
+                        return
+            except Exception as exc:  # pylint: disable=broad-except
+                put(exc)
+            finally:
+                put(done)
+
+        with ThreadPoolExecutor(max_workers=len(producers)) as executor:
+            for producer in producers:
+                executor.submit(run, producer)
+
+            remaining = len(producers)
+            try:
+                while remaining:
+                    item = batches.get()
+                    if item is done:
+                        remaining -= 1
+                    elif isinstance(item, Exception):
+                        self.log.error("Error extracting data: %s", item)
+                        raise item
+                    else:
+                        yield item
+            finally:
+                stop.set()
 
     @abstractmethod
     def _get_connection(self, **kwargs) -> object:
@@ -36,11 +156,26 @@ class ExtractInterface(ABC):
         - **Kwargs parameters are used to get connection
         """
 
-    @abstractmethod
-    def __del__(self) -> None:
+    def close(self) -> None:
         """
-        Close connection to source and shutdown logging
+        Close connection to source, it is safe to call more than once
         """
+        conn = getattr(self, "conn", None)
+        if conn is None:
+            return
+
+        self.conn = None  # pylint: disable=attribute-defined-outside-init
+        conn.close()
+        self.log.info("Connection %s closed", self.__class__.__name__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self.close()
 
     def __start_log(self) -> None:
         """
@@ -1,11 +1,14 @@
 # pylint: disable=duplicate-code, import-error
 
 from abc import ABC, abstractmethod
-from logging import getLogger, shutdown
+from logging import getLogger
 from datetime import datetime
 
 from pytz import timezone
 
+from ...utils.schema_profiler import SchemaProfiler
+from ...utils.table_metadata_cache import TableMetadataCache
+
 
 class LoadInterface(ABC):
     """
@@ -20,9 +23,20 @@ class LoadInterface(ABC):
     def __init__(self, **kwargs):
         """
         In the child class you should define what parameters to be used to get connection
+        Kwargs arguments:
+        - inference_policy: full, first_n, reservoir or per_batch, defaults to full
+        - sample_size: rows profiled by the sampling policies, defaults to 1000
+        - metadata_cache: TableMetadataCache shared with other loaders
+        - metadata_cache_path: JSON file to persist a new metadata cache
         """
         self.__start_log()
 
+        self.inference_policy = kwargs.get("inference_policy", "full")
+        self.sample_size = kwargs.get("sample_size", 1000)
+        self.metadata_cache = kwargs.get("metadata_cache") or TableMetadataCache(
+            path=kwargs.get("metadata_cache_path")
+        )
+
         self._get_connection(**kwargs)
 
     @abstractmethod
@@ -97,29 +111,21 @@ class LoadInterface(ABC):
 
     def _get_python_types(self, columns: set, data: list[dict]):
         """Get types for columns"""
-        cols_and_types = {}
-        for col in columns:
-            types = []
-            for dictionary in data:
-                if col in dictionary.keys():
-                    types.append(type(dictionary[col]))
-            # check if <class 'NoneType'> is in types
-            if type(None) in types:
-                types.remove(type(None))
-            types = list(set(types))
-            cols_and_types[col] = types
-        return cols_and_types
+        return self._get_schema_profiler().update(data).get_python_types(columns)
 
     def _get_columns(self, data: list[dict]) -> set:
         """
         Get columns from data.
         """
-        columns = set()
-        for dictionary in data:
-            for key in dictionary.keys():
-                columns.add(key)
+        return SchemaProfiler().update(data).get_columns()
 
-        return columns
+    def _get_schema_profiler(self) -> SchemaProfiler:
+        """
+        Get a new SchemaProfiler using the inference policy of the class
+        """
+        return SchemaProfiler(
+            policy=self.inference_policy, sample_size=self.sample_size
+        )
 
     def __start_log(self):  # pylint: disable=unused-private-member
         """
@@ -130,7 +136,29 @@ class LoadInterface(ABC):
         self.log.info("Initializing %s class", self.__class__.__name__)
         self.log.info("-----------------------------------------")
 
+    def close(self) -> None:
+        """
+        Close the connection, or give it back to the pool it was taken from
+        """
+        conn = getattr(self, "conn", None)
+        if conn is None:
+            return
+
+        self.conn = None
+        pool = getattr(self, "pool", None)
+        if pool is not None:
+            conn.rollback()
+            pool.putconn(conn)
+            self.log.info("Connection %s returned to pool", self.__class__.__name__)
+        else:
+            conn.close()
+            self.log.info("Connection %s closed", self.__class__.__name__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     def __del__(self):
-        self.conn.close()  # pylint: disable=no-member # type: ignore
-        self.log.info("Connection %s closed", self.__class__.__name__)
-        shutdown()
+        self.close()
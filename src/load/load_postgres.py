@@ -5,14 +5,55 @@ It recieves a dataframe, a schema name, a table name, and a connection string.
 Makes all the treatment necessary and then loads the data into the specified table.
 """
 import re
+import time
 
 import json
+import math
+from io import StringIO
+from datetime import datetime
 
-from psycopg2 import connect
+from psycopg2 import DataError, connect
+from psycopg2.errors import LockNotAvailable
+from psycopg2.extras import execute_values
 
 from pytz import timezone
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .interface.load_interface import LoadInterface
+from ..utils.schema_profiler import SchemaProfiler
+
+LOAD_STRATEGIES = ("upsert", "copy_merge")
+
+JSON_TYPES = ("json", "jsonb")
+
+INTEGER_RANGE = (-(2**31), 2**31 - 1)
+
+BIGINT_RANGE = (-(2**63), 2**63 - 1)
+
+# Column types a batch can outgrow, with the types they are widened to
+WIDER_TYPES = {
+    "smallint": ("integer", "bigint", "numeric", "float"),
+    "integer": ("bigint", "numeric", "float"),
+    "bigint": ("numeric",),
+    "character varying": ("varchar(255)", "text"),
+}
+
+POSTGRES_TYPES = {
+    "str": "varchar(255)",
+    "int": "integer",
+    "float": "float",
+    "bool": "boolean",
+    "dict": "json",
+    "list": "json",
+    "datetime": "timestamp",
+    "Decimal": "numeric",
+    "UUID": "uuid",
+    "bytes": "bytea",
+}
 
 
 class ToPostgres(LoadInterface):
@@ -20,24 +61,138 @@ class ToPostgres(LoadInterface):
     Load data into postgres.
     """
 
+    def __init__(self, **kwargs):
+        """
+        Kwargs arguments:
+        - json_type: json or jsonb, type of the columns created for dicts
+            and lists, defaults to json
+        """
+        self.json_type = kwargs.get("json_type", "json")
+        super().__init__(**kwargs)
+
+        if self.json_type not in JSON_TYPES:
+            self.log.error("Invalid json type: %s", self.json_type)
+            raise ValueError(f"Invalid json type: {self.json_type}")
+
     def load(
         self,
         data: list[dict],
         merge_ids: list,
+        strategy: str = "upsert",
+        schema_profile: SchemaProfiler = None,
+        children: dict = None,
         **kwargs,
     ) -> None:
         """
         Load data into postgres
+        strategy:
+        - upsert: multi-row INSERT ... ON CONFLICT, see _load_data
+        - copy_merge: COPY into a staging table and merge it into the target
+            with INSERT ... SELECT per column signature, see _copy_merge_data
+        schema_profile: SchemaProfiler fed with each batch, so a pipeline can
+            keep one profile for the whole run. A new one using the class
+            inference policy is used when None.
+        children: dict of array field to child rows, see TransformPostgres.explode.
+            Each field is loaded into the {table}_{field} table, in the same
+            transaction as the parent rows, see _load_children.
         **Kwargs parameters:
         - Database
         - Schema
         - Table
+        - page_size: rows sent per round-trip, defaults to 1000
+        - watermark_store: CheckpointInterface where the max date of
+            delta_date_columns is saved after each batch, see _update_watermark
+        - delta_date_columns
+        - lock_timeout, ddl_retries, ddl_retry_delay: see _execute_ddl
         """
+        if strategy not in LOAD_STRATEGIES:
+            self.log.error("Invalid load strategy: %s", strategy)
+            raise ValueError(f"Invalid load strategy: {strategy}")
+
         data = self._add_loaddate(data=data)
 
-        columns = self._get_columns(data=data)
+        if schema_profile is None:
+            schema_profile = self._get_schema_profiler()
+
+        data_columns_types = schema_profile.update(data).get_python_types()
+        statements = self._plan_table_ddl(
+            columns_types=data_columns_types,
+            columns_stats=schema_profile.get_columns_stats(),
+            **kwargs,
+        )
+
+        child_tables, child_statements = self._prepare_child_tables(
+            children=children or {}, merge_ids=merge_ids, **kwargs
+        )
+        if statements or child_statements:
+            self._execute_ddl(statements + child_statements, **kwargs)
+
+        # Sampled profiles can miss a dict or list, then every column is checked
+        json_columns = None
+        if schema_profile.policy == "full":
+            json_columns = self._get_json_columns(data_columns_types)
+
+        load_method = (
+            self._copy_merge_data if strategy == "copy_merge" else self._load_data
+        )
+
+        def write_batch():
+            load_method(
+                columns_and_types=data_columns_types,
+                data=data,
+                merge_ids=merge_ids,
+                json_columns=json_columns,
+                commit=not child_tables,
+                **kwargs,
+            )
+            if child_tables:
+                self._load_children(
+                    child_tables=child_tables, data=data, merge_ids=merge_ids, **kwargs
+                )
 
-        data_columns_types = self._get_python_types(columns, data)
+        try:
+            try:
+                write_batch()
+            except DataError:
+                # A value the profile did not see outgrew a column, widen it once
+                if not self._widen_columns_for_batch(data=data, **kwargs):
+                    raise
+                write_batch()
+        except Exception as error:
+            # The table may have changed behind the cached metadata
+            self.metadata_cache.invalidate(kwargs["schema"], kwargs["table"])
+            for child_kwargs, _ in child_tables:
+                self.metadata_cache.invalidate(
+                    child_kwargs["schema"], child_kwargs["table"]
+                )
+            # Sampled profiles can miss a type, Postgres rejects it at load time
+            if isinstance(error, DataError) and schema_profile.policy != "full":
+                self.log.error(
+                    "Data does not match the types inferred from a %s sample of %s "
+                    "rows. Use inference_policy='full' or a bigger sample_size",
+                    schema_profile.policy,
+                    schema_profile.sample_size,
+                )
+            raise error
+
+        # Runs after the data commit: a crash in between only makes the next
+        # run reload rows that are upserted again
+        if kwargs.get("watermark_store") and kwargs.get("delta_date_columns"):
+            self._update_watermark(data=data, **kwargs)
+
+        return True
+
+    def _plan_table_ddl(
+        self, columns_types: dict, primary_key="id", **kwargs
+    ) -> list[tuple[str, str, str]]:
+        """
+        Plan the DDL a batch needs on a table: a CREATE TABLE when it is missing,
+        otherwise one ALTER TABLE adding the missing columns and widening the
+        columns the batch outgrew. Nothing is planned for an up to date table.
+        Returns a list of (schema, table, sql), see _execute_ddl
+        Kwargs arguments:
+        - columns_stats: value stats of the columns, see SchemaProfiler
+        """
         table_columns = self._get_postgres_columns(**kwargs)
 
         if not table_columns:
@@ -47,45 +202,225 @@ class ToPostgres(LoadInterface):
                 kwargs["schema"],
                 kwargs["table"],
             )
-            self._create_empty_table(columns_types=data_columns_types, **kwargs)
+            sql = self._get_create_table_sql(
+                columns_types=columns_types,
+                is_temp=False,
+                primary_key=primary_key,
+                **kwargs,
+            )
+            return [(kwargs["schema"], kwargs["table"], sql)]
 
-        if table_columns:
-            diff = {
-                k: v for k, v in data_columns_types.items() if k not in table_columns
-            }
-            if diff:
-                self.log.info(
-                    "Table %s.%s.%s does not have all the columns. Adding %s...",
-                    kwargs["database"],
-                    kwargs["schema"],
-                    kwargs["table"],
-                    str(diff),
+        diff = {k: v for k, v in columns_types.items() if k not in table_columns}
+        if diff:
+            self.log.info(
+                "Table %s.%s.%s does not have all the columns. Adding %s...",
+                kwargs["database"],
+                kwargs["schema"],
+                kwargs["table"],
+                str(diff),
+            )
+            self.log.info(
+                "Adding columns to table %s.%s", kwargs["schema"], kwargs["table"]
+            )
+
+        columns_to_widen = self._get_columns_to_widen(
+            table_types=self._get_table_metadata(**kwargs)["types"],
+            columns_types=columns_types,
+            columns_stats=kwargs.get("columns_stats"),
+        )
+        if not diff and not columns_to_widen:
+            return []
+
+        sql = self._get_alter_table_sql(
+            columns_types=diff, columns_to_widen=columns_to_widen, **kwargs
+        )
+        return [(kwargs["schema"], kwargs["table"], sql)]
+
+    def _execute_ddl(self, statements: list[tuple[str, str, str]], **kwargs) -> bool:
+        """
+        Run the planned DDL of a batch in one transaction, so each table is
+        locked once. Committed before the data is loaded, so the locks are
+        not held while the rows are written.
+        A statement waiting longer than lock_timeout for its lock gives up
+        instead of queueing the readers of a busy table behind it, then the
+        whole transaction is retried.
+        Kwargs arguments:
+        - lock_timeout: postgres lock_timeout of the DDL, like "2s",
+            waits forever when None
+        - ddl_retries: int = 3, retries after a lock timeout
+        - ddl_retry_delay: float = 1, seconds between retries
+        """
+        lock_timeout = kwargs.get("lock_timeout")
+        retries = kwargs.get("ddl_retries", 3)
+        retry_delay = kwargs.get("ddl_retry_delay", 1)
+        table_names = ", ".join(f"{schema}.{table}" for schema, table, _ in statements)
+
+        for attempt in range(retries + 1):
+            cursor = self.conn.cursor()
+            try:
+                if lock_timeout is not None:
+                    cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+                for _, _, sql in statements:
+                    cursor.execute(sql)
+                self.conn.commit()
+                return True
+            except LockNotAvailable as error:
+                self.conn.rollback()
+                if attempt == retries:
+                    self.log.error("Timed out locking tables %s", table_names)
+                    self.log.error(error)
+                    raise error
+                self.log.warning(
+                    "Timed out locking tables %s, retrying in %s seconds",
+                    table_names,
+                    retry_delay,
                 )
-                self._add_columns_to_table(columns_types=diff, **kwargs)
+                time.sleep(retry_delay)
+            except Exception as error:
+                self.log.error("Error changing tables %s", table_names)
+                self.log.error(error)
+                self.conn.rollback()
+                raise error
+            finally:
+                cursor.close()
+                for schema, table, _ in statements:
+                    self.metadata_cache.invalidate(schema, table)
 
-        self._load_data(
-            columns_and_types=data_columns_types,
-            data=data,
-            merge_ids=merge_ids,
-            **kwargs,
+        return False
+
+    def _widen_columns_for_batch(self, data: list[dict], **kwargs) -> bool:
+        """
+        Profile every row of a rejected batch and widen the columns it outgrew.
+        Returns False when no column can be widened, so the error stands.
+        """
+        self.metadata_cache.invalidate(kwargs["schema"], kwargs["table"])
+        profile = SchemaProfiler().update(data)
+        columns_to_widen = self._get_columns_to_widen(
+            table_types=self._get_table_metadata(**kwargs)["types"],
+            columns_types=profile.get_python_types(),
+            columns_stats=profile.get_columns_stats(),
         )
+        if not columns_to_widen:
+            return False
+
+        self.log.info("Retrying the batch after widening %s", columns_to_widen)
+        self._alter_column_types(columns_to_widen=columns_to_widen, **kwargs)
         return True
 
-    def _add_columns_to_table(self, columns_types: dict, **kwargs) -> bool:
-        cursor = self.conn.cursor()
-        self.log.info(
-            "Adding columns to table %s.%s", kwargs["schema"], kwargs["table"]
+    def _get_columns_to_widen(
+        self, table_types: dict, columns_types: dict, columns_stats: dict = None
+    ) -> dict:
+        """
+        Get the columns whose values no longer fit their table type,
+        with the type they are widened to, see WIDER_TYPES
+        """
+        columns_stats = columns_stats or {}
+        needed_types = self._get_postgres_types(
+            {col: types for col, types in columns_types.items() if col in table_types},
+            columns_stats,
         )
-        alter_table_sql = self._get_add_columns_sql(
-            columns_types=columns_types, **kwargs
+
+        columns_to_widen = {}
+        for col, needed_type in needed_types.items():
+            current_type = table_types[col]
+            base_type = current_type.split("(")[0]
+            if needed_type not in WIDER_TYPES.get(base_type, ()):
+                continue
+
+            if base_type == "character varying":
+                # varchar(n) only needs widening when a value is longer than n
+                length = int(current_type[len("character varying(") : -1] or 0)
+                max_length = columns_stats.get(col, {}).get("max_length", 0)
+                if "(" not in current_type or max_length <= length:
+                    continue
+                needed_type = "text" if max_length > 255 else needed_type
+
+            columns_to_widen[col] = needed_type
+
+        return columns_to_widen
+
+    def _alter_column_types(self, columns_to_widen: dict, **kwargs) -> bool:
+        """
+        Widen every column in one ALTER TABLE statement
+        """
+        sql = self._get_alter_table_sql(
+            columns_types={}, columns_to_widen=columns_to_widen, **kwargs
         )
+        return self._execute_ddl([(kwargs["schema"], kwargs["table"], sql)], **kwargs)
+
+    def _prepare_child_tables(
+        self, children: dict, merge_ids: list, **kwargs
+    ) -> tuple[list[tuple[dict, list[dict]]], list[tuple[str, str, str]]]:
+        """
+        Plan the DDL of the child table of each exploded array field,
+        keyed by the parent merge_ids and the item position.
+        Returns the kwargs and rows of each child table to load, fields whose
+        table does not exist and have no rows are skipped, and the planned DDL.
+        """
+        child_tables = []
+        statements = []
+        for field, rows in children.items():
+            child_kwargs = {**kwargs, "table": f'{kwargs["table"]}_{field}'}
+            if rows:
+                profile = self._get_schema_profiler().update(rows)
+                statements += self._plan_table_ddl(
+                    columns_types=profile.get_python_types(),
+                    columns_stats=profile.get_columns_stats(),
+                    primary_key=list(merge_ids) + ["position"],
+                    **child_kwargs,
+                )
+            elif not self._get_postgres_columns(**child_kwargs):
+                continue
+
+            child_tables.append((child_kwargs, rows))
+
+        return child_tables, statements
+
+    def _load_children(
+        self, child_tables: list, data: list[dict], merge_ids: list, **kwargs
+    ) -> bool:
+        """
+        Replace the child rows of every parent in the batch and commit them
+        together with the parent rows loaded before.
+        Kwargs arguments:
+        - page_size: int = 1000
+        """
+        page_size = kwargs.get("page_size", 1000)
+        parent_keys = list({tuple(row.get(col) for col in merge_ids) for row in data})
+
+        cursor = self.conn.cursor()
         try:
-            cursor.execute(alter_table_sql)
+            for child_kwargs, rows in child_tables:
+                table_name = f'{child_kwargs["schema"]}.{child_kwargs["table"]}'
+                self.log.info(
+                    "Loading %s child rows into table %s", len(rows), table_name
+                )
+                execute_values(
+                    cursor,
+                    f'DELETE FROM {table_name} WHERE ({", ".join(merge_ids)}) '
+                    "IN (VALUES %s)",
+                    parent_keys,
+                    page_size=page_size,
+                )
+                for columns, group in self._group_by_signature(data=rows).items():
+                    self._adapt_rows(group)
+                    execute_values(
+                        cursor,
+                        self._get_insert_sql(
+                            columns_and_types=dict.fromkeys(columns),
+                            merge_ids=None,
+                            **child_kwargs,
+                        ),
+                        group,
+                        template=self._get_values_template(columns),
+                        page_size=page_size,
+                    )
             self.conn.commit()
-            return True
         except Exception as error:
             self.log.error(
-                "Error adding columns to table %s.%s", kwargs["schema"], kwargs["table"]
+                "Error loading child rows of table %s.%s",
+                kwargs["schema"],
+                kwargs["table"],
             )
             self.log.error(error)
             self.conn.rollback()
@@ -93,48 +428,82 @@ class ToPostgres(LoadInterface):
         finally:
             cursor.close()
 
+        return True
+
+    def _add_columns_to_table(self, columns_types: dict, **kwargs) -> bool:
+        self.log.info(
+            "Adding columns to table %s.%s", kwargs["schema"], kwargs["table"]
+        )
+        alter_table_sql = self._get_add_columns_sql(
+            columns_types=columns_types, **kwargs
+        )
+        return self._execute_ddl(
+            [(kwargs["schema"], kwargs["table"], alter_table_sql)], **kwargs
+        )
+
     def _get_add_columns_sql(self, columns_types: dict, **kwargs) -> str:
+        return self._get_alter_table_sql(columns_types=columns_types, **kwargs)
+
+    def _get_alter_table_sql(
+        self, columns_types: dict, columns_to_widen: dict = None, **kwargs
+    ) -> str:
+        """
+        Get one ALTER TABLE adding the columns of columns_types and changing
+        the type of the columns of columns_to_widen
+        """
         table_name = f'{kwargs["schema"]}.{kwargs["table"]}'
-        sql = f"ALTER TABLE {table_name}"
-        columns_types = self._get_postgres_types(columns_types)
+        columns_types = self._get_postgres_types(
+            columns_types, kwargs.get("columns_stats")
+        )
 
-        for col, col_type in columns_types.items():
-            sql += f" ADD COLUMN IF NOT EXISTS {col} {col_type}, "
+        clauses = [
+            f"ADD COLUMN IF NOT EXISTS {col} {col_type}"
+            for col, col_type in columns_types.items()
+        ]
+        clauses += [
+            f"ALTER COLUMN {col} TYPE {col_type}"
+            for col, col_type in (columns_to_widen or {}).items()
+        ]
 
-        sql = sql[:-2]
+        sql = f"ALTER TABLE {table_name} " + ", ".join(clauses)
         self.log.info("SQL statement: %s", sql)
 
         return sql
 
-    def _create_empty_table(self, columns_types: dict, **kwargs) -> bool:
-        cursor = self.conn.cursor()
+    def _create_empty_table(
+        self, columns_types: dict, primary_key="id", **kwargs
+    ) -> bool:
         self.log.info("Creating table %s.%s", kwargs["schema"], kwargs["table"])
         create_table_sql = self._get_create_table_sql(
-            columns_types=columns_types, is_temp=False, primary_key="id", **kwargs
+            columns_types=columns_types,
+            is_temp=False,
+            primary_key=primary_key,
+            **kwargs,
+        )
+        return self._execute_ddl(
+            [(kwargs["schema"], kwargs["table"], create_table_sql)], **kwargs
         )
-        try:
-            cursor.execute(create_table_sql)
-            self.conn.commit()
-            return True
-        except Exception as error:
-            self.log.error(
-                "Error creating table %s.%s", kwargs["schema"], kwargs["table"]
-            )
-            self.log.error(error)
-            self.conn.rollback()
-            raise error
-        finally:
-            cursor.close()
 
     def _get_create_table_sql(
-        self, columns_types: dict, is_temp: bool, primary_key: str, **kwargs
+        self, columns_types: dict, is_temp: bool, primary_key, **kwargs
     ) -> str:
+        """
+        primary_key: a column name, or a list of columns for a composite key
+        """
         table_name = f'{kwargs["schema"]}.{kwargs["table"]}'
 
-        columns_types = self._get_postgres_types(columns_types)
-
         if is_temp:
-            table_name += "_temp"
+            # Staging table shaped like the target, dropped when the batch commits
+            sql = (
+                f'CREATE TEMP TABLE {kwargs["table"]}_temp '
+                f"(LIKE {table_name}) ON COMMIT DROP"
+            )
+            self.log.info("SQL statement: %s", sql)
+            return sql
+
+        columns_types = self._get_postgres_types(
+            columns_types, kwargs.get("columns_stats")
+        )
 
         sql = f"CREATE TABLE {table_name} ("
 
@@ -144,6 +513,9 @@ class ToPostgres(LoadInterface):
             else:
                 sql += f"{col} {col_type},"
 
+        if isinstance(primary_key, list):
+            sql += f'PRIMARY KEY ({", ".join(primary_key)}),'
+
         sql = sql[:-1] + ")"
         match = re.sub(r"\(\s?\)", "", sql)
 
@@ -163,7 +535,13 @@ class ToPostgres(LoadInterface):
         - user
         - password
         - database
+        - pool: psycopg2 pool the connection is taken from and given back to on close
         """
+        self.pool = kwargs.get("pool")
+        if self.pool is not None:
+            self.conn = self.pool.getconn()
+            return
+
         self.conn = connect(
             host=kwargs["host"],
             port=kwargs["port"],
@@ -173,109 +551,237 @@ class ToPostgres(LoadInterface):
         )
 
     def _get_max_dates_from_table(self, delta_date_columns: list, **kwargs):
-        cursor = self.conn.cursor()
-        dates_list = []
-        try:
-            for date_column in delta_date_columns:
-                dates_list.append(self._get_max_date(date_column, **kwargs))
+        """
+        Get the max date of all delta_date_columns with a single
+        SELECT GREATEST(MAX(a), MAX(b), ...) round-trip.
+        Columns missing from the table are skipped.
+        Kwargs arguments:
+        - watermark_store: CheckpointInterface read first, see _get_watermark
+        """
+        if kwargs.get("watermark_store"):
+            last_date = self._get_watermark(**kwargs)
+            if last_date:
+                self.log.info("Last date found in watermark store: %s", last_date)
+                return last_date
 
-            if None in dates_list:
-                dates_list.remove(None)
+        table_columns = self._get_postgres_columns(**kwargs) or []
+        columns = [col for col in delta_date_columns if col in table_columns]
+        if len(columns) < len(delta_date_columns):
+            self.log.warning(
+                "Columns %s not found in table %s.%s",
+                [col for col in delta_date_columns if col not in table_columns],
+                kwargs["schema"],
+                kwargs["table"],
+            )
+
+        if not columns:
+            self.log.info("No dates found")
+            return None
 
-            if len(dates_list) == 0:
-                self.log.info("No dates found")
-                return None
+        max_columns = ", ".join(f"MAX({col})" for col in columns)
+        sql = (
+            f"SELECT GREATEST({max_columns}) FROM {kwargs['schema']}.{kwargs['table']}"
+        )
 
-            last_date = max(dates_list)
-            self.log.info("Last date found: %s", last_date)
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql)
+            last_date = cursor.fetchone()[0]  # type: ignore
         except Exception as exc:
             self.log.error("Error getting max date from Postgres: %s", exc)
+            self.conn.rollback()
             raise exc
         finally:
             cursor.close()
 
+        if not last_date:
+            self.log.info("No dates found")
+            return None
+
+        # timestamptz comes back in the session TimeZone, convert it to UTC
+        if last_date.tzinfo is None:
+            last_date = last_date.replace(tzinfo=timezone("UTC"))
+        else:
+            last_date = last_date.astimezone(timezone("UTC"))
+        self.log.info("Last date found: %s", last_date)
+
         return last_date
 
-    def _get_max_date(self, date_column: str, **kwargs):
+    def _get_watermark(self, **kwargs):
+        """
+        Get the last date saved for the table in the watermark store,
+        None when the table has no watermark yet.
+        Kwargs arguments:
+        - watermark_store: CheckpointInterface, keyed by schema.table
         """
-        Get max date from Postgres table
+        watermark = kwargs["watermark_store"].get_checkpoint(
+            f"{kwargs['schema']}.{kwargs['table']}"
+        )
+        return watermark["last_date"] if watermark else None
+
+    def _update_watermark(self, data: list[dict], delta_date_columns: list, **kwargs):
         """
-        cursor = self.conn.cursor()
-        sql = f"""
-            SELECT MAX({date_column}) FROM {kwargs['schema']}.{kwargs['table']}
+        Save the max date of delta_date_columns in data in the watermark store.
+        The saved date only moves forward.
+        Kwargs arguments:
+        - watermark_store: CheckpointInterface, keyed by schema.table
         """
+        dates = []
+        for row in data:
+            for col in delta_date_columns:
+                value = row.get(col)
+                if isinstance(value, datetime):
+                    if value.tzinfo is None:
+                        value = value.replace(tzinfo=timezone("UTC"))
+                    dates.append(value)
 
-        try:
-            cursor.execute(sql)
-            max_date = cursor.fetchone()  # type: ignore
-        except Exception as exc:
-            self.log.error("Error while executing SQL statement: %s", exc)
+        if not dates:
             return None
 
-        last_date = max_date[0]
-
-        if last_date:
-            self.log.info("Last date in table: %s", last_date)
-            last_date = last_date.replace(tzinfo=timezone("UTC"))
+        last_date = max(dates)
+        stored_date = self._get_watermark(**kwargs)
+        if stored_date and stored_date >= last_date:
+            return stored_date
 
-        cursor.close()
+        kwargs["watermark_store"].save_checkpoint(
+            f"{kwargs['schema']}.{kwargs['table']}", last_date
+        )
+        self.log.info(
+            "Watermark of %s.%s: %s", kwargs["schema"], kwargs["table"], last_date
+        )
         return last_date
 
-    def _get_postgres_types(self, columns_and_types: dict) -> dict:
-        to_remove = []
+    def _get_postgres_types(
+        self, columns_and_types: dict, columns_stats: dict = None
+    ) -> dict:
+        """
+        Map python types to postgres types, see _resolve_postgres_type.
+        Returns a new dict, so a shared schema profile result is not modified.
+        """
+        columns_stats = columns_stats or {}
+        postgres_types = {}
         for name, _type in columns_and_types.items():
             if not _type:
-                to_remove.append(name)
                 continue
-            if isinstance(_type, list):
-                _type = _type[0]
-            _type = _type.__name__
-
-            type_map = {
-                "str": "varchar(255)",
-                "int": "integer",
-                "float": "float",
-                "bool": "boolean",
-                "dict": "json",
-                "list": "json",
-                "datetime": "timestamp",
-            }
-
-            type_name = type_map.get(_type)
-            if type_name:
-                columns_and_types[name] = type_map[_type]
-            else:
-                columns_and_types[name] = "varchar(255)"
+            types = _type if isinstance(_type, list) else [_type]
+
+            # int subclasses, like bson Int64, resolve as int
+            postgres_types[name] = self._resolve_postgres_type(
+                [
+                    "int" if issubclass(t, int) and t is not bool else t.__name__
+                    for t in types
+                ],
+                columns_stats.get(name, {}),
+            )
+
+        return postgres_types
+
+    def _resolve_postgres_type(self, type_names: list, stats: dict) -> str:
+        """
+        Pick the postgres type of a column from its python types and value stats:
+        - str: varchar(255), text when a value is longer
+        - int: integer, bigint or numeric depending on the value range
+        - datetime: timestamp, timestamptz when values carry a timezone
+        - mixed ints, floats and Decimals: the numeric type holding all of them
+        - any other mix: text
+        """
+        names = [name for name in type_names if name != "NoneType"] or type_names
+        name = names[0]
+
+        if len(set(names)) > 1:
+            if set(names) <= {"dict", "list"}:
+                return self.json_type
+            if set(names) <= {"int", "float"}:
+                return "float"
+            if set(names) <= {"int", "float", "Decimal"}:
+                return "numeric"
+            return "text"
 
-        for name in to_remove:
-            del columns_and_types[name]
-        return columns_and_types
+        if name in ("dict", "list"):
+            return self.json_type
+        if name == "str" and stats.get("max_length", 0) > 255:
+            return "text"
+        if name == "int" and "min" in stats:
+            if INTEGER_RANGE[0] <= stats["min"] and stats["max"] <= INTEGER_RANGE[1]:
+                return "integer"
+            if BIGINT_RANGE[0] <= stats["min"] and stats["max"] <= BIGINT_RANGE[1]:
+                return "bigint"
+            return "numeric"
+        if name == "datetime" and stats.get("tz_aware"):
+            return "timestamptz"
+
+        return POSTGRES_TYPES.get(name, "varchar(255)")
 
     def _get_postgres_columns(self, **kwargs) -> list:
-        columns = []
-        cursor = self.conn.cursor()
         try:
-            cursor.execute(
-                f"""
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = '{kwargs["schema"]}'
-            AND table_name = '{kwargs["table"]}'
-            """
-            )
-            columns = cursor.fetchall()
-            columns = [column[0] for column in columns]
+            metadata = self._get_table_metadata(**kwargs)
         except Exception as exc:
             self.log.error("Error getting columns from table: %s", exc)
             self.conn.rollback()
             return None
-        return columns
+        return metadata["columns"]
+
+    def _get_table_metadata(self, **kwargs) -> dict:
+        """
+        Get columns, types, primary key and unique keys of the table.
+        Metadata is read from the cache and only queried from the catalog on a miss.
+        Missing tables are not cached.
+        """
+        metadata = self.metadata_cache.get(kwargs["schema"], kwargs["table"])
+        if metadata is not None:
+            return metadata
+
+        table_name = f'{kwargs["schema"]}.{kwargs["table"]}'
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                """
+            SELECT attname, format_type(atttypid, atttypmod)
+            FROM pg_attribute
+            WHERE attrelid = to_regclass(%(table)s)
+            AND attnum > 0
+            AND NOT attisdropped
+            ORDER BY attnum
+            """,
+                {"table": table_name},
+            )
+            types = dict(cursor.fetchall())
+
+            cursor.execute(
+                """
+            SELECT i.indisprimary, array_agg(a.attname ORDER BY k.position)
+            FROM pg_index i
+            CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, position)
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+            WHERE i.indrelid = to_regclass(%(table)s)
+            AND i.indisunique
+            GROUP BY i.indexrelid, i.indisprimary
+            """,
+                {"table": table_name},
+            )
+            keys = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        metadata = {
+            "columns": list(types.keys()),
+            "types": types,
+            "primary_key": next((cols for is_pk, cols in keys if is_pk), []),
+            "unique_keys": [cols for _, cols in keys],
+        }
+
+        if metadata["columns"]:
+            self.metadata_cache.set(kwargs["schema"], kwargs["table"], metadata)
+
+        return metadata
 
     def _get_insert_sql(
         self, columns_and_types: dict, merge_ids: list, **kwargs
     ) -> str:
         """
-        Get SQL statement to insert data into Postgres
+        Get SQL statement to insert data into Postgres.
+        The VALUES placeholder is expanded by execute_values,
+        see _get_values_template.
         """
         table_name = f'{kwargs["schema"]}.{kwargs["table"]}'
         sql = f"INSERT INTO {table_name} ("
@@ -283,63 +789,299 @@ class ToPostgres(LoadInterface):
         for col in columns_and_types.keys():
             sql += f"{col}, "
 
-        sql = sql[:-2] + ") VALUES ("
-
-        for col in columns_and_types.keys():
-            sql += f"%({col})s, "
+        sql = sql[:-2] + ") VALUES %s"
+        sql += self._get_on_conflict_sql(
+            columns=columns_and_types.keys(), merge_ids=merge_ids
+        )
 
-        sql = sql[:-2] + ")"
+        self.log.info("SQL statement: %s", sql)
 
-        if merge_ids:
-            sql += " ON CONFLICT ("
-            for col in merge_ids:
-                sql += f"{col}, "
-            sql = sql[:-2] + ") DO UPDATE SET "
+        return sql
 
-            for col in columns_and_types.keys():
-                sql += f"{col} = EXCLUDED.{col}, "
+    def _get_merge_sql(self, columns: list, merge_ids: list, **kwargs) -> str:
+        """
+        Get SQL statement to merge the staging table into the target table
+        """
+        table_name = f'{kwargs["schema"]}.{kwargs["table"]}'
+        columns_sql = ", ".join(columns)
 
-            sql = sql[:-2]
+        sql = (
+            f"INSERT INTO {table_name} ({columns_sql}) "
+            f'SELECT {columns_sql} FROM {kwargs["table"]}_temp'
+        )
+        sql += self._get_on_conflict_sql(columns=columns, merge_ids=merge_ids)
 
         self.log.info("SQL statement: %s", sql)
 
         return sql
 
+    def _get_on_conflict_sql(self, columns: list, merge_ids: list) -> str:
+        """
+        Get the ON CONFLICT clause that updates every column on merge_ids
+        """
+        if not merge_ids:
+            return ""
+
+        sql = " ON CONFLICT ("
+        for col in merge_ids:
+            sql += f"{col}, "
+        sql = sql[:-2] + ") DO UPDATE SET "
+
+        for col in columns:
+            sql += f"{col} = EXCLUDED.{col}, "
+
+        return sql[:-2]
+
+    def _get_values_template(self, columns: list) -> str:
+        """
+        Get the row template used by execute_values to read each row dict
+        """
+        template = "("
+
+        for col in columns:
+            template += f"%({col})s, "
+
+        return template[:-2] + ")"
+
     def _load_data(
         self, columns_and_types: dict, data: list[dict], merge_ids: list, **kwargs
     ) -> bool:
+        """
+        Upsert data into Postgres.
+        Rows are grouped by column signature, so the statement is built once per
+        signature and sent in pages with execute_values. The batch is committed once.
+        Kwargs arguments:
+        - page_size: int = 1000
+        - json_columns: list, see _adapt_rows
+        """
+        page_size = kwargs.get("page_size", 1000)
+        rows_by_signature = self._group_by_signature(
+            data=self._deduplicate(data=data, merge_ids=merge_ids)
+        )
+        self.log.info(
+            "Loading data into table %s.%s using %s statements",
+            kwargs["schema"],
+            kwargs["table"],
+            len(rows_by_signature),
+        )
+
         cursor = self.conn.cursor()
-        for row in data:
-            columns = self._get_columns(data=[row])
-            data_columns_types = self._get_python_types(columns, [row])
-            postgres_columns_and_types = self._get_postgres_types(
-                columns_and_types=data_columns_types
+        try:
+            for columns, rows in rows_by_signature.items():
+                insert_sql = self._get_insert_sql(
+                    columns_and_types={
+                        col: columns_and_types.get(col) for col in columns
+                    },
+                    merge_ids=merge_ids,
+                    **kwargs,
+                )
+                self._adapt_rows(rows, json_columns=kwargs.get("json_columns"))
+
+                execute_values(
+                    cursor,
+                    insert_sql,
+                    rows,
+                    template=self._get_values_template(columns),
+                    page_size=page_size,
+                )
+            if kwargs.get("commit", True):
+                self.conn.commit()
+        except Exception as error:
+            self.log.error(
+                "Error loading data into table %s.%s",
+                kwargs["schema"],
+                kwargs["table"],
             )
-            self.log.info(
-                "Loading data into table %s.%s", kwargs["schema"], kwargs["table"]
+            self.log.error(error)
+            self.conn.rollback()
+            raise error
+        finally:
+            cursor.close()
+
+        return True
+
+    def _copy_merge_data(
+        self, columns_and_types: dict, data: list[dict], merge_ids: list, **kwargs
+    ) -> bool:
+        """
+        COPY data as CSV into a temp staging table shaped like the target and merge
+        it into the target with INSERT ... SELECT ... ON CONFLICT.
+        Rows are staged and merged per column signature, as in _load_data, so a
+        column missing from a row is not updated to NULL.
+        Staging, merge and commit happen in a single transaction.
+        """
+        rows_by_signature = self._group_by_signature(
+            data=self._deduplicate(data=data, merge_ids=merge_ids)
+        )
+        self.log.info(
+            "Copying %s rows into table %s.%s using %s merges",
+            len(data),
+            kwargs["schema"],
+            kwargs["table"],
+            len(rows_by_signature),
+        )
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                self._get_create_table_sql(
+                    columns_types=columns_and_types,
+                    is_temp=True,
+                    primary_key=None,
+                    **kwargs,
+                )
             )
-            insert_sql = self._get_insert_sql(
-                columns_and_types=postgres_columns_and_types,
-                merge_ids=merge_ids,
-                **kwargs,
+            for columns, rows in rows_by_signature.items():
+                cursor.copy_expert(
+                    f'COPY {kwargs["table"]}_temp ({", ".join(columns)}) '
+                    "FROM STDIN WITH (FORMAT csv)",
+                    self._get_csv_buffer(columns, rows),
+                )
+                cursor.execute(
+                    self._get_merge_sql(columns=columns, merge_ids=merge_ids, **kwargs)
+                )
+                cursor.execute(f'TRUNCATE {kwargs["table"]}_temp')
+            if kwargs.get("commit", True):
+                self.conn.commit()
+        except Exception as error:
+            self.log.error(
+                "Error merging data into table %s.%s",
+                kwargs["schema"],
+                kwargs["table"],
             )
-            for key in row.keys():
-                if isinstance(row[key], list):
-                    row[key] = json.dumps({"$list": row[key]})
-                if isinstance(row[key], dict):
-                    row[key] = json.dumps(row[key])
+            self.log.error(error)
+            self.conn.rollback()
+            raise error
+        finally:
+            cursor.close()
+
+        return True
+
+    def _adapt_rows(self, rows: list[dict], json_columns: list = None) -> list[dict]:
+        """
+        Serialize list and dict values as json, in place.
+        json_columns: columns that can hold them, every column when None.
+            The profiled types give them once per batch, so the other
+            columns are never looked at.
+        """
+        for row in rows:
+            for key in row.keys() if json_columns is None else json_columns:
+                value = row.get(key)
+                if isinstance(value, (list, dict)):
+                    row[key] = self._json_dumps(value)
+
+        return rows
+
+    def _get_json_columns(self, columns_and_types: dict) -> list:
+        """
+        Get the columns profiled with dict or list values
+        """
+        return [
+            col
+            for col, types in columns_and_types.items()
+            if types
+            and {dict, list} & set(types if isinstance(types, list) else [types])
+        ]
+
+    def _json_dumps(self, value) -> str:
+        """
+        Serialize a dict or list, lists are wrapped as {"$list": [...]}.
+        orjson is used when installed, values it does not know are sent as str.
+        Both write the same compact text: dates are passed to str, NaN and
+        Infinity, which Postgres rejects, become null, and values orjson
+        rejects, like ints over 64 bits, fall back to json.
+        """
+        if isinstance(value, list):
+            value = {"$list": value}
+
+        if orjson is not None:
             try:
-                cursor.execute(insert_sql, row)
-                self.conn.commit()
-                return True
-            except Exception as error:
-                self.log.error(
-                    "Error loading data into table %s.%s",
-                    kwargs["schema"],
-                    kwargs["table"],
-                )
-                self.log.error(error)
-                self.conn.rollback()
-                raise error
+                return orjson.dumps(
+                    value,
+                    default=str,
+                    option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+                ).decode()
+            except orjson.JSONEncodeError:
+                pass
+
+        try:
+            return self._json_dumps_fallback(value)
+        except ValueError:
+            return self._json_dumps_fallback(self._replace_nan(value))
+
+    def _json_dumps_fallback(self, value) -> str:
+        """
+        Serialize with json the way orjson does, raise ValueError on NaN
+        """
+        return json.dumps(
+            value,
+            default=str,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            allow_nan=False,
+        )
+
+    def _replace_nan(self, value):
+        """
+        Replace NaN and Infinity floats nested in value by None
+        """
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        if isinstance(value, dict):
+            return {key: self._replace_nan(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._replace_nan(item) for item in value]
+
+        return value
+
+    def _get_csv_buffer(self, columns: list, data: list[dict]) -> StringIO:
+        """
+        Serialize rows as CSV for COPY.
+        Every value is quoted, so only unquoted empty fields are read as NULL.
+        """
+        buffer = StringIO()
+        for row in data:
+            values = []
+            for col in columns:
+                value = row.get(col)
+                if value is None:
+                    values.append("")
+                    continue
+                if isinstance(value, (list, dict)):
+                    value = self._json_dumps(value)
+                elif isinstance(value, bytes):
+                    value = "\\x" + value.hex()
+                else:
+                    value = str(value)
+                values.append('"' + value.replace('"', '""') + '"')
+            buffer.write(",".join(values) + "\n")
+
+        buffer.seek(0)
+        return buffer
+
+    def _deduplicate(self, data: list[dict], merge_ids: list) -> list[dict]:
+        """
+        Keep only the last row for each merge key.
+        A single INSERT ... ON CONFLICT cannot update the same row twice.
+        """
+        if not merge_ids:
+            return data
+
+        rows = {}
+        for row in data:
+            rows[tuple(row.get(col) for col in merge_ids)] = row
+
+        if len(rows) < len(data):
+            self.log.info("Dropped %s duplicated rows", len(data) - len(rows))
+
+        return list(rows.values())
+
+    def _group_by_signature(self, data: list[dict]) -> dict:
+        """
+        Group rows by their tuple of column names
+        """
+        rows_by_signature = {}
+        for row in data:
+            rows_by_signature.setdefault(tuple(row), []).append(row)
 
-        cursor.close()
+        return rows_by_signature
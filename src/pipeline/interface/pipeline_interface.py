@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
-
-from logging import getLogger, shutdown
+from collections.abc import Iterator
+from logging import getLogger
+from queue import Full, Queue
+from threading import Event, Thread
 
 
 class PipelineInterface(ABC):
@@ -19,6 +21,7 @@ class PipelineInterface(ABC):
         self.execution_time = 0
         self.percentage_rows_loaded = 0
         self.number_of_executions = 0
+        self.stage_stats = {}
 
     @abstractmethod
     def run(self, **kwargs):
@@ -89,8 +92,75 @@ class PipelineInterface(ABC):
             "number_of_rows_loaded": self.number_of_rows_loaded,
             "execution_time": self.execution_time,
             "percentage_of_rows_loaded": self.percentage_rows_loaded,
+            "stages": self.stage_stats,
         }
 
+    def _record_stage(self, stage: str, rows: int, seconds: float) -> None:
+        """
+        Add a processed batch to the throughput stats of a stage.
+        Each stage runs on a single thread, so its entry has a single writer.
+        """
+        stats = self.stage_stats.setdefault(
+            stage, {"batches": 0, "rows": 0, "busy_time": 0, "rows_per_second": 0}
+        )
+        stats["batches"] += 1
+        stats["rows"] += rows
+        stats["busy_time"] += seconds
+        if stats["busy_time"]:
+            stats["rows_per_second"] = stats["rows"] / stats["busy_time"]
+
+    def _get_stage_rows(self, stage: str) -> int:
+        """
+        Get the rows processed by a stage so far
+        """
+        return self.stage_stats.get(stage, {}).get("rows", 0)
+
+    def _run_stage(self, stage: Iterator, queue_size: int = 4) -> Iterator:
+        """
+        Run a stage iterator on its own thread and yield its items in order.
+        The bounded queue applies backpressure, so at most queue_size items
+        wait between two stages. A stage error is raised to the consumer, and
+        closing the consumer stops the stage.
+        """
+        items: Queue = Queue(maxsize=queue_size)
+        stop = Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def run() -> None:
+            try:
+                for item in stage:
+                    if not put(item):
+                        return
+            except Exception as exc:  # pylint: disable=broad-except
+                put(exc)
+            finally:
+                stage.close()
+                put(done)
+
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    self.log.error("Error running pipeline stage: %s", item)
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
     def __start_log(self) -> None:
         """
         Start logging for class.
@@ -102,4 +172,3 @@ class PipelineInterface(ABC):
 
     def __del__(self) -> None:
         self.log.info("Connection %s closed", self.__class__.__name__)
-        shutdown()
@@ -1,9 +1,14 @@
 # pylint: disable=relative-beyond-top-level
 import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from psycopg2.pool import ThreadedConnectionPool  # pylint: disable=import-error
 
 from ..extract.extract_mongodb import FromMongodb
 from ..transform.transform_to_postgres import TransformPostgres
 from ..load.load_postgres import ToPostgres
+from ..utils.schema_profiler import SchemaProfiler
 
 from .interface.pipeline_interface import PipelineInterface
 
@@ -54,28 +59,79 @@ class MongoToPostgres(PipelineInterface):
         - batch_size: int = 10000,
             - Batch size to be used to extract and load data
         - columns_to_drop: list = [],
-            - List of columns to be dropped from data
+            - List of columns to be dropped from data,
+              also excluded from the Mongodb projection
+        - mongodb_columns: list = None,
+            - Only these fields are read from Mongodb
         - columns_to_rename: dict = {},
             - Dictionary of columns to be renamed from data
+        - inference_policy: str = "full",
+            - full, first_n, reservoir or per_batch, see SchemaProfiler
+        - sample_size: int = 1000,
+            - Rows profiled by the sampling inference policies
+        - watermark_store: CheckpointInterface = None,
+            - Store where the last loaded date of the table is kept, see ToPostgres
+        - checkpoint_store: CheckpointInterface = None,
+            - Store where the last date and _id are saved after each loaded batch.
+              Extraction is then ordered by the first delta date column and _id
+              and resumes from the stored checkpoint.
+        - pipeline_name: str = None,
+            - Name of the checkpoint, defaults to database.collection_to_schema.table
+        - pipelined: bool = False,
+            - Run extract, transform and load as concurrent stages joined by
+              bounded queues, so Mongodb reads overlap Postgres writes
+        - queue_size: int = 4,
+            - Batches waiting between two pipelined stages
+        - flatten: bool = False,
+            - Load nested documents as columns named after their path
+              instead of json columns
+        - flatten_max_depth: int = None,
+            - Nesting levels flattened, deeper documents stay json
+        - flatten_separator: str = "_",
+            - Joins the keys of a flattened column
+        - arrays_to_explode: list = None,
+            - Array fields loaded into {load_table}_{field} child tables, one row
+              per item keyed by merge_ids and position, see TransformPostgres.explode
+        - json_type: str = "json",
+            - json or jsonb, type of the columns created for dicts and lists
+        - lock_timeout: str = None,
+            - Postgres lock_timeout of the table changes, like "2s", a change
+              timing out is retried, see ToPostgres._execute_ddl
+        - ddl_retries: int = 3,
+            - Retries of a table change after a lock timeout
+        - mongodb_client: MongoClient = None,
+            - Client shared with other pipelines, see FromMongodb.get_client.
+              By default one client is opened for the run
+        - postgres_pool: psycopg2 pool = None,
+            - Pool shared with other pipelines.
+              By default a ThreadedConnectionPool is opened for the run
+        - postgres_pool_size: int = 2,
+            - Connections of the pool opened for the run
+        - mongodb_partitions: int = 1,
+            - Split the collection scan in _id ranges read concurrently.
+              Batches arrive unordered, so it cannot be used with a checkpoint_store
         """
         start_time = time.time()
+        self.stage_stats = {}
         try:
-            is_success = self._pipeline(**kwargs)
-            if is_success:
-                self.log.info(
-                    "Pipeline ran successfully. Rows: %s extracted, %s transformed, %s loaded",
-                    self.number_of_rows_extracted,
-                    self.number_of_rows_transformed,
-                    self.number_of_rows_loaded,
-                )
-                self._pipeline(**kwargs)
-            else:
-                self.log.info(
-                    "Pipeline Finished. Rows: %s extracted, %s transformed, %s loaded",
-                    self.number_of_rows_extracted,
-                    self.number_of_rows_transformed,
-                    self.number_of_rows_loaded,
-                )
+            with self._get_connections(**kwargs) as connections:
+                kwargs = {**kwargs, **connections}
+                is_success = self._pipeline(**kwargs)
+                if is_success:
+                    self.log.info(
+                        "Pipeline ran successfully. Rows: %s extracted, %s transformed, %s loaded",
+                        self.number_of_rows_extracted,
+                        self.number_of_rows_transformed,
+                        self.number_of_rows_loaded,
+                    )
+                    self._pipeline(**kwargs)
+                else:
+                    self.log.info(
+                        "Pipeline Finished. Rows: %s extracted, %s transformed, %s loaded",
+                        self.number_of_rows_extracted,
+                        self.number_of_rows_transformed,
+                        self.number_of_rows_loaded,
+                    )
         except Exception as exc:
             self.log.error("Error running pipeline: %s", exc)
             raise RuntimeError(exc) from exc
@@ -92,78 +148,283 @@ class MongoToPostgres(PipelineInterface):
         """
         start_time = time.time()
         self.number_of_executions += 1
-        mongodb = FromMongodb(
+        with FromMongodb(
+            client=kwargs.get("mongodb_client"),
             auth=kwargs["mongodb_auth"],
             host=kwargs["mongodb_host"],
             port=kwargs["mongodb_port"],
             user=kwargs["mongodb_user"],
             password=kwargs["mongodb_password"],
             database=kwargs["mongodb_database"],
-        )
-
-        postgres = ToPostgres(
+        ) as mongodb, ToPostgres(
+            pool=kwargs.get("postgres_pool"),
+            json_type=kwargs.get("json_type", "json"),
             host=kwargs["postgres_host"],
             port=kwargs["postgres_port"],
             user=kwargs["postgres_user"],
             password=kwargs["postgres_password"],
             database=kwargs["postgres_database"],
-        )
+        ) as postgres:
+            checkpoint_store = kwargs.get("checkpoint_store")
+            partitions = kwargs.get("mongodb_partitions", 1)
+            if checkpoint_store and partitions > 1:
+                self.log.error(
+                    "mongodb_partitions cannot be used with a checkpoint_store"
+                )
+                raise ValueError(
+                    "mongodb_partitions cannot be used with a checkpoint_store"
+                )
 
-        last_date = postgres.get_last_load_date(
-            delta_date_columns=kwargs["delta_date_columns"],
-            table=kwargs["load_table"],
-            schema=kwargs["load_schema"],
-            database=kwargs["load_database"],
-        )
+            pipeline_name = self._get_pipeline_name(**kwargs)
+            checkpoint = None
+            if checkpoint_store:
+                checkpoint = checkpoint_store.get_checkpoint(pipeline_name)
 
-        self.log.info(last_date)
+            last_id = None
+            if checkpoint and checkpoint["last_date"]:
+                last_date = checkpoint["last_date"]
+                last_id = checkpoint["last_id"]
+            else:
+                last_date = postgres.get_last_load_date(
+                    delta_date_columns=kwargs["delta_date_columns"],
+                    watermark_store=kwargs.get("watermark_store"),
+                    table=kwargs["load_table"],
+                    schema=kwargs["load_schema"],
+                    database=kwargs["load_database"],
+                )
 
-        extracted_data = mongodb.extract(
-            delta_date_columns=kwargs["delta_date_columns"],
-            batch_size=kwargs["batch_size"],
-            collection=kwargs["mongodb_collection"],
-            aggregation_clause=kwargs["mongodb_aggregation_clause"],
-            filter=kwargs["mongodb_filter"],
-            last_date=last_date,
-        )
+            self.log.info(last_date)
 
-        if not extracted_data or len(extracted_data) == 0:
-            self.log.info("No data extracted")
-            return False
+            batches = mongodb.iter_batches(
+                delta_date_columns=kwargs["delta_date_columns"],
+                batch_size=kwargs["batch_size"],
+                collection=kwargs["mongodb_collection"],
+                aggregation_clause=kwargs["mongodb_aggregation_clause"],
+                filter=kwargs["mongodb_filter"],
+                last_date=last_date,
+                last_id=last_id,
+                ordered=checkpoint_store is not None,
+                partitions=partitions,
+                columns=kwargs.get("mongodb_columns"),
+                exclude_columns=kwargs["columns_to_drop"],
+            )
 
-        self.number_of_rows_extracted = len(extracted_data)
+            transformer = TransformPostgres()
+            schema_profile = SchemaProfiler(
+                policy=kwargs.get("inference_policy", "full"),
+                sample_size=kwargs.get("sample_size", 1000),
+            )
 
-        transformed_columns, transformed_data = TransformPostgres().transform(
-            data=extracted_data,
-            columns_to_drop=kwargs["columns_to_drop"],
-            columns_to_rename=kwargs["columns_to_rename"],
-        )
-        self.log.info("Transformed columns: %s ", transformed_columns)
+            stages = [batches]
+            extracted = self._extract_stage(batches)
+            stages.append(extracted)
+            if kwargs.get("pipelined"):
+                extracted = self._run_stage(extracted, kwargs.get("queue_size", 4))
+                stages.append(extracted)
 
-        if not transformed_data or len(transformed_data) == 0:
-            self.log.info("No data transformed")
-            return False
+            transformed = self._transform_stage(
+                extracted, transformer, checkpoint_store is not None, **kwargs
+            )
+            stages.append(transformed)
+            if kwargs.get("pipelined"):
+                transformed = self._run_stage(transformed, kwargs.get("queue_size", 4))
+                stages.append(transformed)
 
-        self.number_of_rows_transformed = len(transformed_data)
+            # Stage stats add up over the run, keep this call's share apart
+            previous_rows = {
+                stage: self._get_stage_rows(stage)
+                for stage in ("extract", "transform", "load")
+            }
 
-        postgres.load(
-            data=transformed_data,
-            merge_ids=kwargs["merge_ids"],
-            table=kwargs["load_table"],
-            schema=kwargs["load_schema"],
-            database=kwargs["load_database"],
+            try:
+                for batch_checkpoint, transformed_data, children in transformed:
+                    load_start = time.time()
+                    postgres.load(
+                        data=transformed_data,
+                        merge_ids=kwargs["merge_ids"],
+                        schema_profile=schema_profile,
+                        children=children,
+                        delta_date_columns=kwargs["delta_date_columns"],
+                        watermark_store=kwargs.get("watermark_store"),
+                        table=kwargs["load_table"],
+                        schema=kwargs["load_schema"],
+                        database=kwargs["load_database"],
+                        lock_timeout=kwargs.get("lock_timeout"),
+                        ddl_retries=kwargs.get("ddl_retries", 3),
+                    )
+                    self._record_stage(
+                        "load", len(transformed_data), time.time() - load_start
+                    )
+
+                    if checkpoint_store and batch_checkpoint["last_date"] is not None:
+                        checkpoint_store.save_checkpoint(
+                            pipeline_name=pipeline_name, **batch_checkpoint
+                        )
+            finally:
+                # Stops every stage when the load fails. A stage is closed after
+                # the stage reading from it, so none is closed while it runs
+                for stage in reversed(stages):
+                    stage.close()
+
+            rows_extracted = self._get_stage_rows("extract") - previous_rows["extract"]
+            rows_transformed = (
+                self._get_stage_rows("transform") - previous_rows["transform"]
+            )
+            rows_loaded = self._get_stage_rows("load") - previous_rows["load"]
+
+            if rows_extracted == 0:
+                self.log.info("No data extracted")
+                return False
+
+            self.number_of_rows_extracted = rows_extracted
+
+            if rows_transformed == 0:
+                self.log.info("No data transformed")
+                return False
+
+            self.number_of_rows_transformed = rows_transformed
+            self.number_of_rows_loaded = rows_loaded
+            self.percentage_rows_loaded = (
+                self.number_of_rows_loaded / self.number_of_rows_transformed
+            ) * 100
+            end_time = time.time()
+            execution_time = end_time - start_time
+            self.log.info("Execution time of method _pipeline: %s", execution_time)
+            self.log.info("Number of rows extracted: %s", self.number_of_rows_extracted)
+            self.log.info(
+                "Number of rows transformed: %s", self.number_of_rows_transformed
+            )
+            self.log.info("Number of rows loaded: %s", self.number_of_rows_loaded)
+            self.log.info("Pipeline ran successfully.")
+
+            return True
+
+    @contextmanager
+    def _get_connections(self, **kwargs) -> Iterator[dict]:
+        """
+        Open the Mongodb client and the Postgres pool once for the whole run.
+        Connections passed in kwargs are reused and left open for their owner.
+        """
+        opened = []
+        connections = {
+            "mongodb_client": kwargs.get("mongodb_client"),
+            "postgres_pool": kwargs.get("postgres_pool"),
+        }
+
+        try:
+            if connections["mongodb_client"] is None:
+                connections["mongodb_client"] = FromMongodb.get_client(
+                    auth=kwargs["mongodb_auth"],
+                    host=kwargs["mongodb_host"],
+                    port=kwargs["mongodb_port"],
+                    user=kwargs["mongodb_user"],
+                    password=kwargs["mongodb_password"],
+                )
+                opened.append(connections["mongodb_client"].close)
+
+            if connections["postgres_pool"] is None:
+                connections["postgres_pool"] = ThreadedConnectionPool(
+                    minconn=1,
+                    maxconn=kwargs.get("postgres_pool_size", 2),
+                    host=kwargs["postgres_host"],
+                    port=kwargs["postgres_port"],
+                    user=kwargs["postgres_user"],
+                    password=kwargs["postgres_password"],
+                    database=kwargs["postgres_database"],
+                )
+                opened.append(connections["postgres_pool"].closeall)
+
+            yield connections
+        finally:
+            for close in reversed(opened):
+                close()
+
+    def _extract_stage(self, batches: Iterator[list[dict]]) -> Iterator[list[dict]]:
+        """
+        Yield the non-empty extracted batches, timing each read
+        """
+        while True:
+            extract_start = time.time()
+            extracted_data = next(batches, None)
+            if extracted_data is None:
+                return
+
+            if not extracted_data:
+                continue
+
+            self._record_stage(
+                "extract", len(extracted_data), time.time() - extract_start
+            )
+            yield extracted_data
+
+    def _transform_stage(
+        self,
+        extracted: Iterator[list[dict]],
+        transformer: TransformPostgres,
+        checkpointed: bool,
+        **kwargs,
+    ) -> Iterator[tuple[dict, list[dict], dict]]:
+        """
+        Yield the batch checkpoint, the transformed data and the exploded
+        child rows of each batch
+        """
+        for extracted_data in extracted:
+            transform_start = time.time()
+
+            batch_checkpoint = None
+            if checkpointed:
+                # Read from the source rows, before columns are renamed or dropped
+                batch_checkpoint = self._get_batch_checkpoint(
+                    extracted_data, kwargs["delta_date_columns"]
+                )
+
+            transformed_columns, transformed_data = transformer.transform(
+                data=extracted_data,
+                columns_to_drop=kwargs["columns_to_drop"],
+                columns_to_rename=kwargs["columns_to_rename"],
+                flatten=kwargs.get("flatten", False),
+                max_depth=kwargs.get("flatten_max_depth"),
+                separator=kwargs.get("flatten_separator", "_"),
+            )
+            self.log.info("Transformed columns: %s ", transformed_columns)
+
+            if not transformed_data:
+                continue
+
+            children = {}
+            if kwargs.get("arrays_to_explode"):
+                transformed_data, children = transformer.explode(
+                    data=transformed_data,
+                    arrays_to_explode=kwargs["arrays_to_explode"],
+                    merge_ids=kwargs["merge_ids"],
+                )
+
+            self._record_stage(
+                "transform", len(transformed_data), time.time() - transform_start
+            )
+            yield batch_checkpoint, transformed_data, children
+
+    def _get_pipeline_name(self, **kwargs) -> str:
+        """
+        Get the name the pipeline checkpoints are stored under
+        """
+        if kwargs.get("pipeline_name"):
+            return kwargs["pipeline_name"]
+
+        return (
+            f'{kwargs["mongodb_database"]}.{kwargs["mongodb_collection"]}'
+            f'_to_{kwargs["load_schema"]}.{kwargs["load_table"]}'
         )
 
-        self.number_of_rows_loaded = len(transformed_data)
-        self.percentage_rows_loaded = (
-            self.number_of_rows_loaded / self.number_of_rows_transformed
-        ) * 100
-        end_time = time.time()
-        execution_time = end_time - start_time
-        self.log.info("Execution time of method _pipeline: %s", execution_time)
-        self.log.info("Number of rows extracted: %s", self.number_of_rows_extracted)
-        self.log.info("Number of rows transformed: %s", self.number_of_rows_transformed)
-        self.log.info("Number of rows loaded: %s", self.number_of_rows_loaded)
-        self.log.info("Pipeline ran successfully.")
-
-        return True
+    def _get_batch_checkpoint(self, data: list[dict], delta_date_columns: list) -> dict:
+        """
+        Get the checkpoint of an ordered batch, its last row has the highest
+        delta date and _id
+        """
+        last_row = data[-1]
+        last_id = last_row.get("_id")
+
+        return {
+            "last_date": last_row.get(delta_date_columns[0]),
+            "last_id": str(last_id) if last_id is not None else None,
+        }
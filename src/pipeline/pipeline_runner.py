@@ -0,0 +1,265 @@
+# pylint: disable=relative-beyond-top-level
+import time
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from psycopg2.pool import ThreadedConnectionPool  # pylint: disable=import-error
+
+from ..extract.extract_mongodb import FromMongodb
+from .interface.pipeline_interface import PipelineInterface
+from .mongo_to_postgres import MongoToPostgres
+
+
+class PipelineRunner(PipelineInterface):
+    """
+    This class is used to run many pipelines concurrently on a thread pool.
+    Pipelines reading the same Mongodb share one client and pipelines loading
+    the same Postgres database share one pool, which also caps how many of
+    them load that database at the same time.
+    """
+
+    def __init__(self, pipeline_class: type = MongoToPostgres):
+        """
+        pipeline_class: PipelineInterface run for each spec
+        """
+        super().__init__()
+        self.pipeline_class = pipeline_class
+        self.pipeline_stats = {}
+
+    def run(self, **kwargs) -> str:
+        """
+        Run every pipeline spec and wait for all of them.
+        A failing pipeline does not stop the others, the errors are raised
+        together once every pipeline finished.
+        # Kwargs arguments:
+        ## Required
+        - pipelines: list[dict],
+            - Kwargs of each pipeline run, see MongoToPostgres.run
+
+        ## Optional
+        - max_workers: int = 4,
+            - Pipelines running at the same time
+        - max_per_destination: int = 2,
+            - Pipelines loading the same Postgres database at the same time
+        - Any other kwarg is a default shared by every pipeline spec
+        """
+        start_time = time.time()
+        self.number_of_executions += 1
+        specs = kwargs.pop("pipelines")
+        max_workers = kwargs.pop("max_workers", 4)
+        max_per_destination = kwargs.pop("max_per_destination", 2)
+        specs = [{**kwargs, **spec} for spec in specs]
+
+        self.pipeline_stats = {}
+        with self._get_shared_connections(specs, max_per_destination) as shared:
+            errors = self._run_pipelines(
+                specs=[{**spec, **shared[i]} for i, spec in enumerate(specs)],
+                max_workers=max_workers,
+                max_per_destination=max_per_destination,
+            )
+
+        self._aggregate_stats()
+        self.execution_time = time.time() - start_time
+        self.log.info(
+            "%s pipelines finished in %s, %s failed",
+            len(specs),
+            self.execution_time,
+            len(errors),
+        )
+
+        if errors:
+            raise RuntimeError(f"Pipelines failed: {[str(exc) for exc in errors]}")
+
+        return "Pipelines ran successfully."
+
+    def _run_pipelines(
+        self, specs: list[dict], max_workers: int, max_per_destination: int
+    ) -> list[Exception]:
+        """
+        Run the specs on a thread pool, in order, submitting a spec only when
+        its destination has a free slot. Workers never wait for a slot, so specs
+        of other destinations run while a busy destination is full.
+        Returns the errors of the failed pipelines.
+        """
+        destinations = [self._get_destination_key(**spec) for spec in specs]
+        pending = list(range(len(specs)))
+        running = {}
+        errors = []
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for i in self._get_ready_specs(
+                    pending=pending,
+                    destinations=destinations,
+                    running=list(running.values()),
+                    max_workers=max_workers,
+                    max_per_destination=max_per_destination,
+                ):
+                    pending.remove(i)
+                    future = executor.submit(self._pipeline, **specs[i])
+                    running[future] = destinations[i]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    try:
+                        pipeline_name, stats = future.result()
+                        self.pipeline_stats[pipeline_name] = stats
+                    except Exception as exc:  # pylint: disable=broad-except
+                        errors.append(exc)
+
+        return errors
+
+    def _get_ready_specs(  # pylint: disable=too-many-arguments
+        self,
+        pending: list[int],
+        destinations: list[tuple],
+        running: list[tuple],
+        max_workers: int,
+        max_per_destination: int,
+    ) -> list[int]:
+        """
+        Get the pending specs, in order, that can start now: a worker is free
+        and their destination runs less than max_per_destination pipelines
+        """
+        ready = []
+        for i in pending:
+            if len(running) >= max_workers:
+                break
+            if running.count(destinations[i]) < max_per_destination:
+                running.append(destinations[i])
+                ready.append(i)
+
+        return ready
+
+    def _pipeline(self, **kwargs) -> tuple[str, dict]:
+        """
+        Run one pipeline spec and return its name and stats
+        """
+        pipeline = self.pipeline_class()
+        pipeline_name = pipeline._get_pipeline_name(  # pylint: disable=protected-access
+            **kwargs
+        )
+        try:
+            pipeline.run(**kwargs)
+        except Exception as exc:
+            self.log.error("Error running %s: %s", pipeline_name, exc)
+            raise RuntimeError(f"{pipeline_name}: {exc}") from exc
+
+        return pipeline_name, pipeline.get_stats()
+
+    def get_stats(self) -> dict:
+        """
+        Get the stats summed over every pipeline and the stats of each one
+        """
+        stats = super().get_stats()
+        stats["pipelines"] = self.pipeline_stats
+        return stats
+
+    def _aggregate_stats(self) -> None:
+        """
+        Sum the stats of every pipeline
+        """
+        pipeline_stats = self.pipeline_stats.values()
+        self.number_of_rows_extracted = sum(
+            stats["number_of_rows_extracted"] for stats in pipeline_stats
+        )
+        self.number_of_rows_transformed = sum(
+            stats["number_of_rows_transformed"] for stats in pipeline_stats
+        )
+        self.number_of_rows_loaded = sum(
+            stats["number_of_rows_loaded"] for stats in pipeline_stats
+        )
+        self.percentage_rows_loaded = 0
+        if self.number_of_rows_transformed:
+            self.percentage_rows_loaded = (
+                self.number_of_rows_loaded / self.number_of_rows_transformed
+            ) * 100
+
+        self.stage_stats = {}
+        for stats in pipeline_stats:
+            for stage, stage_stats in stats.get("stages", {}).items():
+                total = self.stage_stats.setdefault(
+                    stage,
+                    {"batches": 0, "rows": 0, "busy_time": 0, "rows_per_second": 0},
+                )
+                total["batches"] += stage_stats["batches"]
+                total["rows"] += stage_stats["rows"]
+                total["busy_time"] += stage_stats["busy_time"]
+                if total["busy_time"]:
+                    total["rows_per_second"] = total["rows"] / total["busy_time"]
+
+    @contextmanager
+    def _get_shared_connections(
+        self, specs: list[dict], max_per_destination: int
+    ) -> Iterator[list[dict]]:
+        """
+        Open one Mongodb client per source and one Postgres pool per
+        destination, and give each spec the ones it uses.
+        Connections already in a spec are left as they are.
+        """
+        clients = {}
+        pools = {}
+        shared = []
+
+        try:
+            for spec in specs:
+                connections = {}
+
+                if spec.get("mongodb_client") is None:
+                    source = self._get_source_key(**spec)
+                    if source not in clients:
+                        clients[source] = FromMongodb.get_client(
+                            auth=spec["mongodb_auth"],
+                            host=spec["mongodb_host"],
+                            port=spec["mongodb_port"],
+                            user=spec["mongodb_user"],
+                            password=spec["mongodb_password"],
+                        )
+                    connections["mongodb_client"] = clients[source]
+
+                if spec.get("postgres_pool") is None:
+                    destination = self._get_destination_key(**spec)
+                    if destination not in pools:
+                        pools[destination] = ThreadedConnectionPool(
+                            minconn=1,
+                            maxconn=max_per_destination,
+                            host=spec["postgres_host"],
+                            port=spec["postgres_port"],
+                            user=spec["postgres_user"],
+                            password=spec["postgres_password"],
+                            database=spec["postgres_database"],
+                        )
+                    connections["postgres_pool"] = pools[destination]
+
+                shared.append(connections)
+
+            yield shared
+        finally:
+            for client in clients.values():
+                client.close()
+            for pool in pools.values():
+                pool.closeall()
+
+    def _get_source_key(self, **kwargs) -> tuple:
+        """
+        Get the key of the Mongodb server a spec reads from
+        """
+        return (
+            kwargs["mongodb_host"],
+            kwargs["mongodb_port"],
+            kwargs["mongodb_auth"],
+            kwargs["mongodb_user"],
+        )
+
+    def _get_destination_key(self, **kwargs) -> tuple:
+        """
+        Get the key of the Postgres database a spec loads into
+        """
+        return (
+            kwargs["postgres_host"],
+            kwargs["postgres_port"],
+            kwargs["postgres_user"],
+            kwargs["postgres_database"],
+        )
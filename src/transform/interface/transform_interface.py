@@ -1,8 +1,49 @@
 from abc import ABC, abstractmethod
-from logging import getLogger, shutdown
+from functools import lru_cache
+from logging import getLogger
 
 import unidecode  # pylint: disable=import-error
 
+from ...utils.schema_profiler import SchemaProfiler
+
+COLUMN_NAME_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=COLUMN_NAME_CACHE_SIZE)
+def treat_column_name(col: str) -> str:
+    """
+    Remove $oid, $date, ., $, space and diactrics from a column name.
+    Results are cached by raw name and shared by every transformer, so only
+    names never seen before are treated and logged.
+    """
+    log = getLogger(__name__)
+    if ".$oid" in col:
+        log.info("Remove .$oid from column: %s", col)
+        if "id" not in col.replace(".$oid", ""):
+            col = col.replace(".$oid", "_id")
+        else:
+            col = col.replace(".$oid", "")
+    if ".$date" in col:
+        log.info("Remove .$date from column: %s", col)
+        if "date" not in col.replace(".$date", ""):
+            col = col.replace(".$date", "_date")
+        else:
+            col = col.replace(".$date", "")
+    if "." in col:
+        log.info("Replace . to _ in column: %s", col)
+        col = col.replace(".", "_")
+    if "$" in col:
+        log.info("Remove $ from column: %s", col)
+        col = col.replace("$", "")
+    if " " in col:
+        log.info("Replace space to _ in column: %s", col)
+        col = col.replace(" ", "_")
+    if not col.isascii():
+        log.info("Remove diactrics from column: %s", col)
+        col = unidecode.unidecode(col).replace(" ", "_")
+
+    return col
+
 
 class TransformInterface(ABC):
     """
@@ -15,44 +56,69 @@ class TransformInterface(ABC):
     def __init__(self) -> object:
         self.__start_log()
 
+        self.transform_plans = {}
+
     @abstractmethod
     def transform(  # pylint: disable=dangerous-default-value
         self,
         data: list[dict],
         columns_to_drop: list = [],
         columns_to_rename: dict = {},
-        **kwargs
+        **kwargs,
     ) -> [dict]:
         """
         Transform data from source and return a list of dicts
         """
 
-    def _flatten_data(self, data: list[dict]) -> list[dict]:
+    def _flatten_data(
+        self, data: list[dict], max_depth: int = None, separator: str = "_"
+    ) -> list[dict]:
         """
-        Flatten data to be sent to postgres.
+        Flatten nested dicts into columns named after their path,
+        writing each row once into a new dict.
+        Parameters:
+        - max_depth: nesting levels flattened, None flattens every level.
+            Deeper dicts are kept as values.
+        - separator: joins the keys of a path
         """
-        # needs testing
-        for row in data:
-            for key, value in row.items():
-                if isinstance(value, dict):
-                    for key2, value2 in value.items():
-                        row[key + "_" + key2] = value2
-                    row.pop(key)
-        return data
+        return [dict(self._flatten_row(row, max_depth, separator)) for row in data]
+
+    def _flatten_row(
+        self,
+        row: dict,
+        max_depth: int = None,
+        separator: str = "_",
+        columns_to_skip: set = frozenset(),
+    ):
+        """
+        Yield the flattened (column, value) pairs of a row without recursion.
+        A column in columns_to_skip is left out with everything nested under it.
+        Empty dicts are kept as values.
+        """
+        # Each level keeps its own items iterator, so keys come out in order
+        stack = [(None, iter(row.items()), 0)]
+        while stack:
+            prefix, items, depth = stack[-1]
+            for key, value in items:
+                column = key if prefix is None else f"{prefix}{separator}{key}"
+                if column in columns_to_skip:
+                    continue
+
+                if (
+                    isinstance(value, dict)
+                    and value
+                    and (max_depth is None or depth < max_depth)
+                ):
+                    stack.append((column, iter(value.items()), depth + 1))
+                    break
+
+                yield column, value
+            else:
+                stack.pop()
 
     def _get_python_types(self, columns: set, data: list[dict]):
         """Get types for columns"""
-        cols_and_types = {}
-        for col in columns:
-            types = []
-            for dictionary in data:
-                if col in dictionary.keys():
-                    types.append(type(dictionary[col]))
-            if "NoneType" in types:
-                types.remove("NoneType")
-            types = list(set(types))
-            cols_and_types[col] = types
-        return cols_and_types
+        return SchemaProfiler().update(data).get_python_types(columns)
 
     def _drop_columns(self, data: list[dict], columns_to_drop: list) -> list[dict]:
         """
@@ -96,40 +162,11 @@ class TransformInterface(ABC):
         columns_to_rename = {}
 
         for col in columns:
-            if ".$oid" in col:
-                self.log.info("Remove .$oid from column: %s", col)
-                if "id" not in col.replace(".$oid", ""):
-                    columns_to_rename[col] = col.replace(".$oid", "_id")
-                    col = col.replace(".$oid", "_id")
-                else:
-                    columns_to_rename[col] = col.replace(".$oid", "")
-                    col = col.replace(".$oid", "")
-            if ".$date" in col:
-                self.log.info("Remove .$date from column: %s", col)
-                if "date" not in col.replace(".$date", ""):
-                    columns_to_rename[col] = col.replace(".$date", "_date")
-                    col = col.replace(".$date", "_date")
-                else:
-                    columns_to_rename[col] = col.replace(".$date", "")
-                    col = col.replace(".$date", "")
-            if "." in col:
-                self.log.info("Replace . to _ in column: %s", col)
-                columns_to_rename[col] = col.replace(".", "_")
-                col = col.replace(".", "_")
-            if "$" in col:
-                self.log.info("Remove $ from column: %s", col)
-                columns_to_rename[col] = col.replace("$", "")
-                col = col.replace("$", "")
-            if " " in col:
-                self.log.info("Replace space to _ in column: %s", col)
-                columns_to_rename[col] = col.replace(" ", "_")
-                col = col.replace(" ", "_")
-            if not col.isascii():
-                self.log.info("Remove diactrics from column: %s", col)
-                columns_to_rename[col] = unidecode.unidecode(col).replace(" ", "_")
-                col = unidecode.unidecode(col).replace(" ", "_")
-
-        self.log.info("Columns to rename: %s", columns_to_rename)
+            treated_col = self._get_treated_column_name(col)
+            if treated_col != col:
+                columns_to_rename[col] = treated_col
+
+        self.log.debug("Columns to rename: %s", columns_to_rename)
 
         data = self._rename_columns(data, columns_to_rename)
 
@@ -137,6 +174,83 @@ class TransformInterface(ABC):
 
         return columns, data
 
+    def _get_treated_column_name(self, col: str) -> str:
+        """Get the column name without $oid, $date, ., $, space and diactrics"""
+        return treat_column_name(col)
+
+    def _get_transform_plan(
+        self, columns_to_drop: list, columns_to_rename: dict
+    ) -> dict:
+        """
+        Get the plan of a drop and rename configuration, a dict of source
+        column to its final name or None when dropped.
+        The plan is kept across batches and only grows when a new column shows up.
+        """
+        key = (tuple(columns_to_drop), tuple(columns_to_rename.items()))
+        if key not in self.transform_plans:
+            self.transform_plans[key] = {}
+
+        return self.transform_plans[key]
+
+    def _apply_transform_plan(  # pylint: disable=too-many-arguments
+        self,
+        data: list[dict],
+        columns_to_drop: list,
+        columns_to_rename: dict,
+        flatten: bool = False,
+        max_depth: int = None,
+        separator: str = "_",
+    ) -> [set, list[dict]]:
+        """
+        Flatten, drop, rename and treat the column names of every row
+        in a single pass, writing each row once into a new dict.
+        As in _rename_columns, a renamed value wins over a column
+        that already has its new name, whatever the key order.
+        """
+        plan = self._get_transform_plan(columns_to_drop, columns_to_rename)
+        columns_to_skip = set(columns_to_drop)
+        columns = set()
+        transformed_data = []
+
+        for row in data:
+            transformed_row = {}
+            renamed = set()
+            items = row.items()
+            if flatten:
+                items = self._flatten_row(row, max_depth, separator, columns_to_skip)
+
+            for key, value in items:
+                if key not in plan:
+                    plan[key] = self._plan_column(
+                        key, columns_to_drop, columns_to_rename
+                    )
+
+                name = plan[key]
+                if name is None:
+                    continue
+
+                if name != key:
+                    renamed.add(name)
+                elif name in renamed:
+                    continue
+
+                transformed_row[name] = value
+            columns.update(transformed_row)
+            transformed_data.append(transformed_row)
+
+        return columns, transformed_data
+
+    def _plan_column(
+        self, column: str, columns_to_drop: list, columns_to_rename: dict
+    ) -> str:
+        """
+        Get the final name of a column, None when it is dropped
+        """
+        if column in columns_to_drop:
+            return None
+
+        return self._get_treated_column_name(columns_to_rename.get(column, column))
+
     def __start_log(self) -> None:
         """
         Start logging for class
@@ -148,4 +262,3 @@ class TransformInterface(ABC):
 
     def __del__(self) -> None:
         self.log.info("Connection %s closed", self.__class__.__name__)
-        shutdown()
@@ -1,5 +1,5 @@
 # pylint: disable=import-error, no-name-in-module, too-few-public-methods
-from .interface.transform_interface import TransformInterface
+from .interface.transform_interface import TransformInterface, treat_column_name
 
 
 class TransformPostgres(TransformInterface):
@@ -12,17 +12,79 @@ class TransformPostgres(TransformInterface):
         data: list[dict],
         columns_to_drop: list = [],
         columns_to_rename: dict = {},
-        **kwargs  # pylint: disable=unused-argument
+        **kwargs
     ) -> list[dict]:
         """
-        Transform data to be sent to postgres
+        Transform data to be sent to postgres.
+        Rows go through a single pass plan, see _apply_transform_plan
+        Kwargs arguments:
+        - flatten: bool = False, turn nested documents into columns
+        - max_depth: int = None, nesting levels flattened, None for all
+        - separator: str = "_", joins the keys of a flattened column
+        Arrays are moved to child tables by explode, after the transform.
         """
-        if columns_to_drop:
-            data = self._drop_columns(data, columns_to_drop)
+        return self._apply_transform_plan(
+            data,
+            columns_to_drop or [],
+            columns_to_rename or {},
+            flatten=kwargs.get("flatten", False),
+            max_depth=kwargs.get("max_depth"),
+            separator=kwargs.get("separator", "_"),
+        )
 
-        if columns_to_rename:
-            data = self._rename_columns(data, columns_to_rename)
+    def explode(
+        self, data: list[dict], arrays_to_explode: list, merge_ids: list
+    ) -> tuple[list[dict], dict]:
+        """
+        Move array fields out of the rows into child rows, one per item.
+        Each child row has the merge_ids of its parent, the item position and
+        either the flattened fields of a document item or a value column.
+        Item fields named like a merge id or position are overwritten by them.
+        When a parent shows up twice in the batch only its last arrays are kept,
+        the same row the load keeps.
+        Returns the parent rows and a dict of array field to its child rows.
+        """
+        if not arrays_to_explode:
+            return data, {}
+
+        if not merge_ids:
+            self.log.error("Exploding arrays needs merge_ids to key the child rows")
+            raise ValueError("Exploding arrays needs merge_ids to key the child rows")
+
+        children = {field: {} for field in arrays_to_explode}
+        for row in data:
+            parent_key = {col: row.get(col) for col in merge_ids}
+            key = tuple(parent_key.values())
+            for field in arrays_to_explode:
+                items = row.pop(field, None)
+                if items is None:
+                    children[field].pop(key, None)
+                    continue
+                if not isinstance(items, list):
+                    items = [items]
 
-        columns, data = self._treat_column_names(data)
+                children[field][key] = [
+                    self._get_child_row(item, position, parent_key)
+                    for position, item in enumerate(items)
+                ]
+
+        return data, {
+            field: [child for rows in rows_by_parent.values() for child in rows]
+            for field, rows_by_parent in children.items()
+        }
+
+    def _get_child_row(self, item, position: int, parent_key: dict) -> dict:
+        """
+        Get the child row of an array item
+        """
+        if isinstance(item, dict):
+            child = {
+                treat_column_name(column): value
+                for column, value in self._flatten_row(item)
+            }
+        else:
+            child = {"value": item}
 
-        return columns, data
+        child.update(parent_key)
+        child["position"] = position
+        return child
@@ -0,0 +1,133 @@
+import random
+from datetime import datetime
+
+INFERENCE_POLICIES = ("full", "first_n", "reservoir", "per_batch")
+
+
+class SchemaProfiler:
+    """
+    Profile the columns and python types of a list of dicts in a single pass.
+    It can be fed incrementally, batch by batch, and the same result reused
+    for table creation, ALTER TABLE and insert SQL generation.
+
+    Inference policies:
+    - full: every row is profiled
+    - first_n: only the first sample_size rows ever seen are profiled
+    - reservoir: reservoir sample of sample_size rows over the whole stream
+    - per_batch: the first sample_size rows of every batch are profiled
+
+    With a sampling policy, rows with a column that was not seen before
+    are always profiled, so new columns are never missed.
+
+    Profiled values also feed per column stats used to pick precise
+    database types: max_length of strings, min and max of ints and
+    tz_aware when a datetime carries a timezone.
+    """
+
+    def __init__(
+        self, policy: str = "full", sample_size: int = 1000, seed: int = None
+    ) -> None:
+        if policy not in INFERENCE_POLICIES:
+            raise ValueError(f"Invalid inference policy: {policy}")
+
+        self.policy = policy
+        self.sample_size = sample_size
+        # column -> dict used as an ordered set of the types seen for it
+        self.columns_types: dict[str, dict] = {}
+        self.columns_stats: dict[str, dict] = {}
+        self.number_of_rows = 0
+        self.number_of_profiled_rows = 0
+        self._random = random.Random(seed)
+
+    def update(self, data: list[dict], sample: bool = True) -> "SchemaProfiler":
+        """
+        Add the columns and types of data to the profile.
+        sample=False profiles every row regardless of the policy.
+        """
+        if self.policy == "full" or not sample:
+            for row in data:
+                self._profile_row(row)
+        else:
+            columns = self.columns_types.keys()
+            for index, row in enumerate(data):
+                if not row.keys() <= columns or self._is_sampled(
+                    self.number_of_rows + index, index
+                ):
+                    self._profile_row(row)
+
+        self.number_of_rows += len(data)
+        return self
+
+    def get_columns(self) -> set:
+        """
+        Get every column seen so far
+        """
+        return set(self.columns_types)
+
+    def get_python_types(self, columns: set = None) -> dict:
+        """
+        Get a list of types for each column, in the order they were seen.
+        NoneType is only kept for columns that never had any other value.
+        """
+        if columns is None:
+            columns = self.columns_types.keys()
+
+        cols_and_types = {}
+        for col in columns:
+            types = list(self.columns_types.get(col, {}))
+            if len(types) > 1 and type(None) in types:
+                types.remove(type(None))
+            cols_and_types[col] = types
+
+        return cols_and_types
+
+    def get_columns_stats(self, columns: set = None) -> dict:
+        """
+        Get the value stats of each column, see the class docstring
+        """
+        if columns is None:
+            return dict(self.columns_stats)
+
+        return {col: self.columns_stats.get(col, {}) for col in columns}
+
+    def _is_sampled(self, position: int, index: int) -> bool:
+        """
+        Check if the row at position in the stream, index in its batch, is profiled
+        """
+        if self.policy == "per_batch":
+            return index < self.sample_size
+        if position < self.sample_size:
+            return True
+        if self.policy == "reservoir":
+            return self._random.randrange(position + 1) < self.sample_size
+        return False
+
+    def _profile_row(self, row: dict) -> None:
+        columns_types = self.columns_types
+        for col, value in row.items():
+            value_type = type(value)
+            types = columns_types.get(col)
+            if types is None:
+                types = columns_types[col] = {}
+            types[value_type] = None
+
+            if isinstance(value, (str, int, datetime)) and value_type is not bool:
+                self._profile_value(col, value)
+
+        self.number_of_profiled_rows += 1
+
+    def _profile_value(self, col: str, value) -> None:
+        stats = self.columns_stats.get(col)
+        if stats is None:
+            stats = self.columns_stats[col] = {}
+
+        if isinstance(value, str):
+            if len(value) > stats.get("max_length", 0):
+                stats["max_length"] = len(value)
+        elif isinstance(value, int):
+            if value < stats.get("min", value + 1):
+                stats["min"] = value
+            if value > stats.get("max", value - 1):
+                stats["max"] = value
+        elif value.tzinfo is not None:
+            stats["tz_aware"] = True
@@ -0,0 +1,53 @@
+import json
+import os
+from threading import Lock
+
+
+class TableMetadataCache:
+    """
+    Cache the metadata of target tables keyed by schema.table, so the catalog is
+    not queried for every batch. Metadata is a dict with:
+    - columns: list of column names
+    - types: dict of column name and database type
+    - primary_key: list of columns
+    - unique_keys: list of lists of columns
+    When path is given the cache is persisted as JSON and reused across runs.
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        self._tables: dict[str, dict] = {}
+        self._lock = Lock()
+
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self._tables = json.load(file)
+
+    def get(self, schema: str, table: str) -> dict:
+        """
+        Get the cached metadata of a table, None when it is not cached
+        """
+        return self._tables.get(f"{schema}.{table}")
+
+    def set(self, schema: str, table: str, metadata: dict) -> None:
+        """
+        Cache the metadata of a table
+        """
+        with self._lock:
+            self._tables[f"{schema}.{table}"] = metadata
+            self._persist()
+
+    def invalidate(self, schema: str, table: str) -> None:
+        """
+        Remove a table from the cache, it will be read from the catalog again
+        """
+        with self._lock:
+            if self._tables.pop(f"{schema}.{table}", None) is not None:
+                self._persist()
+
+    def _persist(self) -> None:
+        if not self.path:
+            return
+
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(self._tables, file)
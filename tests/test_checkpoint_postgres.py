@@ -0,0 +1,37 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, too-few-public-methods. redefined-outer-name, protected-access, unused-import
+from datetime import datetime, timezone
+
+import pytest  # pylint: disable=import-error
+
+from ..src.checkpoint.checkpoint_postgres import PostgresCheckpointStore
+
+
+@pytest.fixture(scope="module")
+def obj():
+    yield PostgresCheckpointStore(
+        host="localhost",
+        port="5432",
+        database="postgres_test",
+        user="postgres",
+        password="postgres",
+        checkpoint_table="public.etl_checkpoints_test",
+    )
+
+
+class TestPostgresCheckpointStore:
+    """
+    Testing the Postgres checkpoint store.
+    """
+
+    def test_get_checkpoint_without_checkpoint(self, obj):
+        assert obj.get_checkpoint("not_a_pipeline") is None
+
+    def test_save_checkpoint(self, obj):
+        last_date = datetime(2023, 8, 20, tzinfo=timezone.utc)
+        obj.save_checkpoint(
+            "users_to_public.users", last_date, "507f1f77bcf86cd799439011"
+        )
+        assert obj.get_checkpoint("users_to_public.users") == {
+            "last_date": last_date,
+            "last_id": "507f1f77bcf86cd799439011",
+        }
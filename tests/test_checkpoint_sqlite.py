@@ -0,0 +1,60 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, too-few-public-methods. redefined-outer-name, protected-access, unused-import
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest  # pylint: disable=import-error
+
+from ..src.checkpoint.checkpoint_sqlite import SQLiteCheckpointStore
+
+
+@pytest.fixture
+def obj():
+    yield SQLiteCheckpointStore(path=":memory:")
+
+
+class TestSQLiteCheckpointStore:
+    """
+    Testing the SQLite checkpoint store.
+    """
+
+    def test_get_checkpoint_without_checkpoint(self, obj):
+        assert obj.get_checkpoint("users_to_public.users") is None
+
+    def test_save_checkpoint(self, obj):
+        last_date = datetime(2023, 8, 20, tzinfo=timezone.utc)
+        obj.save_checkpoint(
+            "users_to_public.users", last_date, "507f1f77bcf86cd799439011"
+        )
+        assert obj.get_checkpoint("users_to_public.users") == {
+            "last_date": last_date,
+            "last_id": "507f1f77bcf86cd799439011",
+        }
+
+    def test_save_checkpoint_overwrites(self, obj):
+        obj.save_checkpoint("users_to_public.users", datetime(2023, 8, 20), "1")
+        obj.save_checkpoint("users_to_public.users", datetime(2023, 8, 21), "2")
+        checkpoint = obj.get_checkpoint("users_to_public.users")
+        assert checkpoint["last_date"] == datetime(2023, 8, 21)
+        assert checkpoint["last_id"] == "2"
+
+    def test_persist(self, tmp_path):
+        path = str(tmp_path / "checkpoints.db")
+        SQLiteCheckpointStore(path=path).save_checkpoint("p", datetime(2023, 8, 20))
+        assert SQLiteCheckpointStore(path=path).get_checkpoint("p") == {
+            "last_date": datetime(2023, 8, 20),
+            "last_id": None,
+        }
+
+    def test_close(self, tmp_path):
+        with SQLiteCheckpointStore(path=str(tmp_path / "checkpoints.db")) as store:
+            store.save_checkpoint("p", datetime(2023, 8, 20))
+
+        assert store.conn is None
+        store.close()
+
+    def test_failed_connection_closes_quietly(self, tmp_path):
+        with pytest.raises(sqlite3.OperationalError):
+            SQLiteCheckpointStore(path=str(tmp_path / "missing" / "checkpoints.db"))
+
+        store = SQLiteCheckpointStore.__new__(SQLiteCheckpointStore)
+        store.close()
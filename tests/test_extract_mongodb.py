@@ -4,7 +4,15 @@ from datetime import datetime
 
 import pytest  # pylint: disable=import-error
 
-from ..src.extract.extract_mongodb import FromMongodb  # pylint: disable=import-error
+from bson import encode, decode_all  # pylint: disable=import-error
+from bson.int64 import Int64  # pylint: disable=import-error
+
+from ..src.extract.extract_mongodb import (  # pylint: disable=import-error
+    DEFAULT_CODEC_OPTIONS,
+    FromMongodb,
+)
+from ..src.load.load_postgres import ToPostgres
+from ..src.utils.schema_profiler import SchemaProfiler
 
 
 @pytest.fixture(scope="module")
@@ -35,6 +43,100 @@ class TestFromMongodb:
         assert len(data) == 4
         assert isinstance(data, list)
 
+    def test_extract_decodes_bson_types(self, obj):
+        data = obj.extract(
+            aggregation_clause=None,
+            batch_size=10000,
+            collection="users",
+            delta_date_columns=None,
+            filter=None,
+            last_date=None,
+        )
+        assert data[0]["_id"] == "507f1f77bcf86cd799439011"
+        assert isinstance(data[0]["aniversario"], datetime)
+        assert data[0]["aniversario"].tzinfo is not None
+
+    def test_iter_batches(self, obj):
+        batches = list(
+            obj.iter_batches(
+                aggregation_clause=None,
+                batch_size=2,
+                collection="users",
+                delta_date_columns=None,
+                filter=None,
+                last_date=None,
+            )
+        )
+        assert len(batches) == 2
+        assert sum(len(batch) for batch in batches) == 4
+
+    def test_iter_partitioned_batches(self, obj):
+        data = obj.extract(
+            aggregation_clause=None,
+            batch_size=10000,
+            collection="users",
+            delta_date_columns=None,
+            filter=None,
+            last_date=None,
+            partitions=2,
+        )
+        assert len(data) == 4
+        assert len({row["_id"] for row in data}) == 4
+
+    def test_decode_int64(self):
+        data = decode_all(
+            encode({"small": Int64(1), "big": Int64(2**40)}), DEFAULT_CODEC_OPTIONS
+        )
+        assert data == [{"small": 1, "big": 2**40}]
+        assert type(data[0]["big"]) is int  # pylint: disable=unidiomatic-typecheck
+
+        profile = SchemaProfiler().update(data)
+        assert ToPostgres(pool=MagicMock())._get_postgres_types(
+            profile.get_python_types(), profile.get_columns_stats()
+        ) == {"small": "integer", "big": "bigint"}
+
+    def test_shared_client_left_open(self):
+        client = MagicMock()
+        with FromMongodb(client=client, database="mydatabase") as extractor:
+            assert extractor.db is client.__getitem__.return_value
+
+        client.close.assert_not_called()
+
+    def test_get_projection(self, obj):
+        assert obj._get_projection() is None
+        assert obj._get_projection(exclude_columns=["blob"]) == {"blob": 0}
+        assert obj._get_projection(
+            columns=["name", "blob"], exclude_columns=["blob"]
+        ) == {
+            "name": 1,
+            "_id": 0,
+        }
+        assert obj._get_projection(
+            required=["updated_at", "_id"], exclude_columns=["_id", "blob"]
+        ) == {"blob": 0}
+
+    def test_partitions_merge_streams(self):
+        extractor = FromMongodb(client=MagicMock(), database="mydatabase")
+        extractor._get_split_points = MagicMock(return_value=[5])
+        extractor._get_cursor = MagicMock(
+            side_effect=lambda **kwargs: [encode({"_id": 1}), encode({"_id": 7})]
+        )
+
+        data = extractor.extract(
+            collection="users", filter=None, aggregation_clause=None, partitions=2
+        )
+        assert sorted(row["_id"] for row in data) == [1, 1, 7, 7]
+        assert extractor._get_cursor.call_count == 2
+
+    def test_get_partition_conditions(self, obj):
+        conditions = obj._get_partition_conditions("_id", [1, 5])
+        assert conditions == [
+            {"$or": [{"_id": {"$lt": 1}}, {"_id": None}]},
+            {"_id": {"$gte": 1, "$lt": 5}},
+            {"_id": {"$gte": 5}},
+        ]
+        assert obj._get_partition_conditions("_id", []) == [{}]
+
     def test_connection_and_log(self, obj):
         assert obj
         assert obj.client
@@ -83,6 +185,20 @@ class TestFromMongodb:
         assert cursor
         assert cursor.alive
 
+    def test_get_cursor_with_last_id(self, obj):
+        cursor = obj._get_cursor(
+            batch_size=10000,
+            delta_date_columns=["aniversario"],
+            last_date=datetime(1995, 1, 1),
+            last_id="507f1f77bcf86cd799439011",
+            ordered=True,
+            filter=None,
+            aggregation_clause=None,
+            collection="users",
+        )
+        assert cursor
+        assert cursor.alive
+
     def test_get_cursor_with_filter(self, obj):
         cursor = obj._get_cursor(
             batch_size=10000,
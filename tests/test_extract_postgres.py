@@ -1,4 +1,6 @@
 # pylint: disable=missing-module-docstring, missing-function-docstring, too-few-public-methods. redefined-outer-name, protected-access, unused-import
+from unittest.mock import MagicMock
+
 import pytest
 from ..src.extract.extract_postgres import FromPostgres  # pylint: disable=import-error
 from .postgres.fixture_postgres import (
@@ -35,6 +37,126 @@ class TestExtractPostgres:  # pylint: disable=too-few-public-methods
         assert data
         assert data == fixture_extracted_data
 
+    def test_iter_batches(self, obj, fixture_extracted_data):
+        batches = list(
+            obj.iter_batches(schema="public", table="employees", batch_size=1)
+        )
+        assert len(batches) == 2
+        assert [row for batch in batches for row in batch] == fixture_extracted_data
+
+    def test_iter_keyset_batches(self, obj, fixture_extracted_data):
+        batches = list(
+            obj.iter_batches(
+                schema="public", table="employees", batch_size=1, pagination="keyset"
+            )
+        )
+        assert len(batches) == 2
+        assert [row for batch in batches for row in batch] == fixture_extracted_data
+
+    def test_iter_keyset_batches_start_after(self, obj, fixture_extracted_data):
+        data = obj.extract(
+            schema="public",
+            table="employees",
+            pagination="keyset",
+            key_columns=["id"],
+            start_after=(1,),
+        )
+        assert data == fixture_extracted_data[1:]
+
+    def test_iter_partitioned_batches_by_ctid(self, obj, fixture_extracted_data):
+        data = obj.extract(schema="public", table="employees", partitions=2)
+        assert sorted(data, key=lambda row: row["id"]) == fixture_extracted_data
+
+    def test_iter_partitioned_batches_by_column(self, obj, fixture_extracted_data):
+        data = obj.extract(
+            schema="public",
+            table="employees",
+            partitions=2,
+            partition_column="id",
+            snapshot=False,
+        )
+        assert sorted(data, key=lambda row: row["id"]) == fixture_extracted_data
+
+    def test_get_column_partitions(self, obj):
+        conditions = obj._get_column_partitions(
+            schema="public", table="employees", column="id", partitions=2
+        )
+        assert conditions == ["id < '1' or id is null", "id >= '1'"]
+
+    def test_get_select_query_with_partition_condition(self, obj):
+        sql = obj._get_select_query(
+            schema="public",
+            table="employees",
+            delta_date_columns=["last_update"],
+            last_date="2021-01-01",
+            partition_condition="id >= '1'",
+        )
+        assert sql == (
+            "SELECT * FROM public.employees "
+            "where (last_update >= '2021-01-01') and (id >= '1')"
+        )
+
+    def test_get_select_query_with_columns(self, obj):
+        sql = obj._get_select_query(
+            schema="public",
+            table="employees",
+            delta_date_columns=[],
+            columns=["id", "email"],
+        )
+        assert sql == "SELECT id, email FROM public.employees"
+
+    def test_iter_batches_exclude_columns(self, obj, fixture_extracted_data):
+        data = obj.extract(
+            schema="public", table="employees", exclude_columns=["email"]
+        )
+        assert data == [
+            {key: value for key, value in row.items() if key != "email"}
+            for row in fixture_extracted_data
+        ]
+
+    def test_get_select_columns_keeps_required(self, obj):
+        columns = obj._get_select_columns(
+            required=["id"],
+            schema="public",
+            table="employees",
+            columns=["email"],
+        )
+        assert columns == ["email", "id"]
+        assert obj._get_select_columns(schema="public", table="employees") is None
+
+    def test_get_primary_key(self, obj):
+        assert obj._get_primary_key(schema="public", table="employees") == ["id"]
+
+    def test_get_keyset_query(self, obj):
+        sql, params = obj._get_keyset_query(
+            schema="public",
+            table="employees",
+            order_columns=["last_update", "id"],
+            batch_size=100,
+            delta_column="last_update",
+            last_date="2021-01-01",
+            last_key=("2021-01-02", 10),
+        )
+        assert sql == (
+            "SELECT * FROM public.employees WHERE last_update >= %(last_date)s "
+            "AND (last_update, id) > (%(key_0)s, %(key_1)s) "
+            "ORDER BY last_update, id LIMIT 100"
+        )
+        assert params == {
+            "last_date": "2021-01-01",
+            "key_0": "2021-01-02",
+            "key_1": 10,
+        }
+
+    def test_keyset_with_multiple_delta_columns(self, obj):
+        with pytest.raises(ValueError):
+            obj.extract(
+                schema="public",
+                table="employees",
+                delta_date_columns=["a", "b"],
+                pagination="keyset",
+            )
+
     def test_connection_and_log(self, obj):
         assert obj
         assert obj.conn
@@ -72,3 +194,18 @@ class TestExtractPostgres:  # pylint: disable=too-few-public-methods
             last_date=None,
         )
         assert sql == "SELECT * FROM public.employees"
+
+    def test_close(self):
+        extractor = FromPostgres.__new__(FromPostgres)
+        extractor.close()
+
+        extractor.log = MagicMock()
+        extractor.conn = conn = MagicMock()
+        extractor.pool = pool = MagicMock()
+        with extractor:
+            pass
+
+        conn.close.assert_called_once()
+        pool.closeall.assert_called_once()
+        extractor.close()
+        conn.close.assert_called_once()
@@ -3,16 +3,24 @@
 Tests for load_postgres.py and load_interface.py
 """
 from io import StringIO
+import json
+from unittest.mock import MagicMock
 import logging
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import pytest  # pylint: disable=import-error
+from bson.int64 import Int64  # pylint: disable=import-error
+from psycopg2.errors import (
+    LockNotAvailable,
+)  # pylint: disable=import-error,no-name-in-module
 from .postgres.fixture_postgres import (  # pylint: disable=unused-import
     fixture_extracted_data,
     fixture_load_data,
     fixture_new_column_data,
 )
 
+from ..src.checkpoint.checkpoint_sqlite import SQLiteCheckpointStore
+from ..src.load import load_postgres
 from ..src.load.load_postgres import ToPostgres
 
 
@@ -50,6 +58,19 @@ class TestToPostgres:  # pylint: disable=too-many-public-methods
         columns = obj._get_postgres_columns(schema="public", table="employees")
         assert columns == ["id", "first_name", "last_name", "email"]
 
+    def test_get_table_metadata(self, obj):
+        obj.metadata_cache.invalidate("public", "employees")
+        metadata = obj._get_table_metadata(schema="public", table="employees")
+        assert metadata["columns"] == ["id", "first_name", "last_name", "email"]
+        assert metadata["types"]["id"] == "integer"
+        assert metadata["primary_key"] == ["id"]
+        assert obj.metadata_cache.get("public", "employees") == metadata
+
+    def test_get_table_metadata_missing_table(self, obj):
+        metadata = obj._get_table_metadata(schema="public", table="not_table")
+        assert metadata["columns"] == []
+        assert obj.metadata_cache.get("public", "not_table") is None
+
     def test_create_empty_table(self, obj):
         cursor = obj.conn.cursor()
         cursor.execute("DROP TABLE IF EXISTS public.employees_load")
@@ -81,6 +102,66 @@ class TestToPostgres:  # pylint: disable=too-many-public-methods
         )
         assert max_dates
 
+    def test_get_max_dates_from_table_multiple_columns(self, obj):
+        max_dates = obj._get_max_dates_from_table(
+            delta_date_columns=["loaddate", "createdate"],
+            database="postgres_test",
+            schema="public",
+            table="employees_test_load",
+        )
+        assert max_dates.tzinfo is not None
+
+    def test_get_max_dates_from_table_session_time_zone(self, obj):
+        cursor = obj.conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS public.test_max_dates_tz")
+        cursor.execute("CREATE TABLE public.test_max_dates_tz (updated_at timestamptz)")
+        cursor.execute(
+            "INSERT INTO public.test_max_dates_tz VALUES ('2023-01-01 12:00:00+00')"
+        )
+        cursor.execute("SET TIME ZONE 'America/Sao_Paulo'")
+        try:
+            max_date = obj._get_max_dates_from_table(
+                delta_date_columns=["updated_at"],
+                database="postgres_test",
+                schema="public",
+                table="test_max_dates_tz",
+            )
+        finally:
+            cursor.execute("RESET TIME ZONE")
+            cursor.execute("DROP TABLE public.test_max_dates_tz")
+            obj.conn.commit()
+            cursor.close()
+
+        assert max_date == datetime(2023, 1, 1, 12, tzinfo=timezone.utc)
+        assert max_date.utcoffset() == timedelta(0)
+
+    def test_watermark_store(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        kwargs = {
+            "schema": "public",
+            "table": "employees_test_load",
+            "watermark_store": SQLiteCheckpointStore(),
+        }
+        assert loader._get_watermark(**kwargs) is None
+
+        last_date = loader._update_watermark(
+            data=[{"loaddate": datetime(2023, 8, 25)}, {"loaddate": None}],
+            delta_date_columns=["loaddate"],
+            **kwargs,
+        )
+        loader._update_watermark(
+            data=[{"loaddate": datetime(2023, 8, 1)}],
+            delta_date_columns=["loaddate"],
+            **kwargs,
+        )
+        assert last_date == datetime(2023, 8, 25, tzinfo=timezone.utc)
+        assert loader._get_watermark(**kwargs) == last_date
+        assert (
+            loader.get_last_load_date(delta_date_columns=["loaddate"], **kwargs)
+            == last_date
+        )
+        loader.conn.cursor.assert_not_called()
+
     def test_add_columns_to_table(self, obj):
         cursor = obj.conn.cursor()
         cursor.execute(
@@ -136,6 +217,176 @@ class TestToPostgres:  # pylint: disable=too-many-public-methods
         )
         assert sql
 
+    def test_get_values_template(self, obj):
+        template = obj._get_values_template(["id", "first_name"])
+        assert template == "(%(id)s, %(first_name)s)"
+
+    def test_group_by_signature(self, obj):
+        rows_by_signature = obj._group_by_signature(
+            data=[{"id": 1, "a": 1}, {"id": 2}, {"id": 3, "a": 3}]
+        )
+        assert list(rows_by_signature.keys()) == [("id", "a"), ("id",)]
+        assert len(rows_by_signature[("id", "a")]) == 2
+
+    def test_deduplicate(self, obj):
+        data = obj._deduplicate(
+            data=[{"id": 1, "a": "old"}, {"id": 2, "a": "b"}, {"id": 1, "a": "new"}],
+            merge_ids=["id"],
+        )
+        assert data == [{"id": 1, "a": "new"}, {"id": 2, "a": "b"}]
+
+    def test_load_data_with_duplicated_merge_ids(self, obj, fixture_load_data):
+        data = fixture_load_data + [dict(fixture_load_data[0], first_name="Liz")]
+        success = obj._load_data(
+            columns_and_types={},
+            data=data,
+            merge_ids=["id"],
+            database="postgres_test",
+            schema="public",
+            table="employees_test_load",
+        )
+        assert success
+
+    def test_load_copy_merge(self, obj, fixture_load_data):
+        success = obj.load(
+            data=fixture_load_data,
+            merge_ids=["id"],
+            strategy="copy_merge",
+            database="postgres_test",
+            schema="public",
+            table="employees_test_load",
+        )
+        assert success
+
+    def test_load_copy_merge_keeps_missing_columns(self, obj):
+        kwargs = {
+            "database": "postgres_test",
+            "schema": "public",
+            "table": "test_copy_merge_sparse",
+        }
+        cursor = obj.conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS public.test_copy_merge_sparse")
+        obj.conn.commit()
+        obj.metadata_cache.invalidate("public", "test_copy_merge_sparse")
+
+        obj.load(
+            data=[{"id": 1, "name": "John", "email": "john@example.com"}],
+            merge_ids=["id"],
+            strategy="copy_merge",
+            **kwargs,
+        )
+        obj.load(
+            data=[{"id": 1, "name": "Johnny"}, {"id": 2, "email": "jane@example.com"}],
+            merge_ids=["id"],
+            strategy="copy_merge",
+            **kwargs,
+        )
+
+        cursor.execute(
+            "SELECT id, name, email FROM public.test_copy_merge_sparse ORDER BY id"
+        )
+        rows = cursor.fetchall()
+        cursor.execute("DROP TABLE public.test_copy_merge_sparse")
+        obj.conn.commit()
+        cursor.close()
+        assert rows == [
+            (1, "Johnny", "john@example.com"),
+            (2, None, "jane@example.com"),
+        ]
+
+    def test_copy_merge_per_signature(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        loader._copy_merge_data(
+            columns_and_types={"id": [int], "name": [str], "email": [str]},
+            data=[{"id": 1, "name": "Johnny"}, {"id": 2, "email": "jane@example.com"}],
+            merge_ids=["id"],
+            schema="public",
+            table="users",
+        )
+
+        cursor = loader.conn.cursor.return_value
+        assert [call.args[0] for call in cursor.copy_expert.call_args_list] == [
+            "COPY users_temp (id, name) FROM STDIN WITH (FORMAT csv)",
+            "COPY users_temp (id, email) FROM STDIN WITH (FORMAT csv)",
+        ]
+        merges = [
+            call.args[0]
+            for call in cursor.execute.call_args_list
+            if call.args[0].startswith("INSERT")
+        ]
+        assert merges[0].endswith(
+            "DO UPDATE SET id = EXCLUDED.id, name = EXCLUDED.name"
+        )
+        assert "email" not in merges[0]
+
+    def test_load_children(self, obj):
+        success = obj.load(
+            data=[{"id": 1, "first_name": "John"}, {"id": 2, "first_name": "Jane"}],
+            merge_ids=["id"],
+            children={
+                "tags": [
+                    {"value": "a", "id": 1, "position": 0},
+                    {"value": "b", "id": 1, "position": 1},
+                ]
+            },
+            database="postgres_test",
+            schema="public",
+            table="employees_test_load",
+        )
+        assert success
+
+        cursor = obj.conn.cursor()
+        cursor.execute(
+            "SELECT id, position, value FROM public.employees_test_load_tags "
+            "ORDER BY id, position"
+        )
+        assert cursor.fetchall() == [(1, 0, "a"), (1, 1, "b")]
+        cursor.close()
+
+    def test_get_create_table_sql_composite_key(self, obj):
+        sql = obj._get_create_table_sql(
+            columns_types={"id": int, "position": int, "value": str},
+            schema="public",
+            table="employees_tags",
+            is_temp=False,
+            primary_key=["id", "position"],
+        )
+        assert sql == (
+            "CREATE TABLE public.employees_tags (id integer,position integer,"
+            "value varchar(255),PRIMARY KEY (id, position))"
+        )
+
+    def test_load_invalid_strategy(self, obj, fixture_load_data):
+        with pytest.raises(ValueError):
+            obj.load(
+                data=fixture_load_data,
+                merge_ids=["id"],
+                strategy="not_a_strategy",
+                database="postgres_test",
+                schema="public",
+                table="employees_test_load",
+            )
+
+    def test_get_merge_sql(self, obj):
+        sql = obj._get_merge_sql(
+            columns=["id", "email"],
+            merge_ids=["id"],
+            schema="public",
+            table="employees_test_load",
+        )
+        assert sql == (
+            "INSERT INTO public.employees_test_load (id, email) "
+            "SELECT id, email FROM employees_test_load_temp "
+            "ON CONFLICT (id) DO UPDATE SET id = EXCLUDED.id, email = EXCLUDED.email"
+        )
+
+    def test_get_csv_buffer(self, obj):
+        buffer = obj._get_csv_buffer(
+            columns=["id", "name", "email"],
+            data=[{"id": 1, "name": 'Jo "J"', "email": None}, {"id": 2, "name": ""}],
+        )
+        assert buffer.getvalue() == '"1","Jo ""J""",\n"2","",\n'
+
     def test_load_data(self, obj, fixture_load_data):
         cursor = obj.conn.cursor()
         cursor.execute("DELETE FROM public.employees_test_load WHERE id = 5;")
@@ -314,3 +565,185 @@ class TestToPostgres:  # pylint: disable=too-many-public-methods
         logger.addHandler(log_handler)
 
         return log_stream
+
+    def test_pooled_connection_returned_on_close(self) -> None:
+        pool = MagicMock()
+        with ToPostgres(pool=pool) as loader:
+            assert loader.conn is pool.getconn.return_value
+
+        pool.putconn.assert_called_once_with(pool.getconn.return_value)
+        pool.getconn.return_value.close.assert_not_called()
+        loader.close()
+        pool.putconn.assert_called_once()
+
+    def test_jsonb_columns(self) -> None:
+        loader = ToPostgres(pool=MagicMock(), json_type="jsonb")
+        assert loader._get_postgres_types(
+            {"payload": [dict], "tags": [list], "id": [int]}
+        ) == {"payload": "jsonb", "tags": "jsonb", "id": "integer"}
+
+        with pytest.raises(ValueError):
+            ToPostgres(pool=MagicMock(), json_type="xml")
+
+    def test_adapt_rows_only_json_columns(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        json_columns = loader._get_json_columns(
+            {"payload": [dict], "tags": [type(None), list], "id": [int]}
+        )
+        assert json_columns == ["payload", "tags"]
+
+        rows = loader._adapt_rows(
+            [{"id": 1, "payload": {"a": 1}, "tags": ["x"]}, {"id": 2, "tags": None}],
+            json_columns=json_columns,
+        )
+        assert json.loads(rows[0]["payload"]) == {"a": 1}
+        assert json.loads(rows[0]["tags"]) == {"$list": ["x"]}
+        assert rows[1] == {"id": 2, "tags": None}
+
+    def test_json_dumps_matches_json(self, monkeypatch) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        values = [
+            {
+                "created_at": datetime(2023, 1, 1, 12, 30, tzinfo=timezone.utc),
+                "tags": ["a", 1, 1.5],
+                "nome": "José",
+            },
+            [float("nan"), {"b": float("inf")}],
+            {"big": 2**65, "ratio": float("nan")},
+        ]
+        dumped = [loader._json_dumps(value) for value in values]
+
+        monkeypatch.setattr(load_postgres, "orjson", None)
+        assert [loader._json_dumps(value) for value in values] == dumped
+        assert dumped == [
+            '{"created_at":"2023-01-01 12:30:00+00:00",'
+            '"tags":["a",1,1.5],"nome":"José"}',
+            '{"$list":[null,{"b":null}]}',
+            '{"big":36893488147419103232,"ratio":null}',
+        ]
+
+    def test_max_date_converted_to_utc(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        loader._get_postgres_columns = MagicMock(return_value=["updated_at"])
+        # A session in TimeZone -03 returns 12:00 UTC as 09:00-03:00
+        loader.conn.cursor.return_value.fetchone.return_value = (
+            datetime(2023, 1, 1, 9, tzinfo=timezone(timedelta(hours=-3))),
+        )
+
+        max_date = loader._get_max_dates_from_table(
+            delta_date_columns=["updated_at"], schema="public", table="users"
+        )
+        assert max_date == datetime(2023, 1, 1, 12, tzinfo=timezone.utc)
+        assert max_date.hour == 12
+
+    def test_resolve_postgres_type(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        assert loader._get_postgres_types(
+            {
+                "small": [int],
+                "big": [int],
+                "huge": [int],
+                "text": [str],
+                "mixed": [type(None), int, float],
+                "other": [int, str],
+                "nulls": [type(None)],
+                "long": [Int64, int],
+                "flag": [bool],
+            },
+            {
+                "small": {"min": 0, "max": 10},
+                "big": {"min": 0, "max": 2**40},
+                "huge": {"min": 0, "max": 2**70},
+                "text": {"max_length": 300},
+                "long": {"min": 0, "max": 2**40},
+            },
+        ) == {
+            "small": "integer",
+            "big": "bigint",
+            "huge": "numeric",
+            "text": "text",
+            "mixed": "float",
+            "other": "text",
+            "nulls": "varchar(255)",
+            "long": "bigint",
+            "flag": "boolean",
+        }
+
+    def test_get_columns_to_widen(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        assert loader._get_columns_to_widen(
+            table_types={
+                "id": "integer",
+                "name": "character varying(255)",
+                "code": "character varying(10)",
+                "price": "numeric",
+            },
+            columns_types={
+                "id": [int],
+                "name": [str],
+                "code": [str],
+                "price": [int],
+                "new": [str],
+            },
+            columns_stats={
+                "id": {"min": 1, "max": 2**40},
+                "name": {"max_length": 100},
+                "code": {"max_length": 20},
+                "price": {"min": 1, "max": 2},
+                "new": {"max_length": 1000},
+            },
+        ) == {"id": "bigint", "code": "varchar(255)"}
+
+    def test_alter_column_types(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        loader._alter_column_types(
+            columns_to_widen={"id": "bigint", "name": "text"},
+            schema="public",
+            table="users",
+        )
+        loader.conn.cursor.return_value.execute.assert_called_once_with(
+            "ALTER TABLE public.users ALTER COLUMN id TYPE bigint, "
+            "ALTER COLUMN name TYPE text"
+        )
+        loader.conn.commit.assert_called_once()
+
+    def test_plan_table_ddl(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        loader._get_table_metadata = MagicMock(
+            return_value={"columns": ["id", "name"], "types": {"id": "integer"}}
+        )
+        statements = loader._plan_table_ddl(
+            columns_types={"id": [int], "name": [str], "email": [str]},
+            columns_stats={"id": {"min": 1, "max": 2**40}},
+            database="postgres_test",
+            schema="public",
+            table="users",
+        )
+        assert statements == [
+            (
+                "public",
+                "users",
+                "ALTER TABLE public.users ADD COLUMN IF NOT EXISTS email "
+                "varchar(255), ALTER COLUMN id TYPE bigint",
+            )
+        ]
+        assert not loader._plan_table_ddl(
+            columns_types={"id": [int]}, schema="public", table="users"
+        )
+
+    def test_execute_ddl_retries_lock_timeout(self) -> None:
+        loader = ToPostgres(pool=MagicMock())
+        cursor = loader.conn.cursor.return_value
+        cursor.execute.side_effect = [None, LockNotAvailable(), None, None]
+        statements = [("public", "users", "ALTER TABLE public.users ADD COLUMN a int")]
+
+        assert loader._execute_ddl(
+            statements, lock_timeout="2s", ddl_retries=1, ddl_retry_delay=0
+        )
+        cursor.execute.assert_any_call("SET LOCAL lock_timeout = %s", ("2s",))
+        assert loader.conn.rollback.call_count == 1
+        loader.conn.commit.assert_called_once()
+
+        cursor.execute.side_effect = LockNotAvailable()
+        with pytest.raises(LockNotAvailable):
+            loader._execute_ddl(statements, ddl_retries=0)
@@ -1,4 +1,5 @@
 # pylint: disable=missing-module-docstring, missing-function-docstring, too-few-public-methods. redefined-outer-name, protected-access, unused-import
+import threading
 from unittest.mock import MagicMock
 from datetime import datetime
 
@@ -50,3 +51,94 @@ class TestMongoToPostgres:
         assert obj.number_of_rows_loaded
         assert obj.execution_time
         assert obj.percentage_rows_loaded
+
+    def test_get_batch_checkpoint(self, obj):
+        checkpoint = obj._get_batch_checkpoint(
+            data=[
+                {"_id": "507f1f77bcf86cd799439011", "created_at": datetime(2023, 1, 1)},
+                {"_id": "507f1f77bcf86cd799439012", "created_at": datetime(2023, 1, 2)},
+            ],
+            delta_date_columns=["created_at"],
+        )
+        assert checkpoint == {
+            "last_date": datetime(2023, 1, 2),
+            "last_id": "507f1f77bcf86cd799439012",
+        }
+
+    def test_get_pipeline_name(self, obj):
+        name = obj._get_pipeline_name(
+            mongodb_database="mydatabase",
+            mongodb_collection="users",
+            load_schema="public",
+            load_table="employees_pipeline",
+        )
+        assert name == "mydatabase.users_to_public.employees_pipeline"
+        assert obj._get_pipeline_name(pipeline_name="users") == "users"
+
+    def test_run_stage_keeps_order(self, obj):
+        stage = (i for i in range(10))
+        assert list(obj._run_stage(stage, queue_size=2)) == list(range(10))
+
+    def test_run_stage_raises(self, obj):
+        def stage():
+            yield 1
+            raise ValueError("stage failed")
+
+        with pytest.raises(ValueError):
+            list(obj._run_stage(stage()))
+
+    def test_load_error_stops_stages(self, mocker):
+        mongodb = mocker.patch(
+            "simple_etl.src.pipeline.mongo_to_postgres.FromMongodb"
+        ).return_value.__enter__.return_value
+        mongodb.iter_batches.return_value = (
+            [{"_id": str(i), "name": "John"}] for i in range(100)
+        )
+        postgres = mocker.patch(
+            "simple_etl.src.pipeline.mongo_to_postgres.ToPostgres"
+        ).return_value.__enter__.return_value
+        postgres.load.side_effect = RuntimeError("load failed")
+        threads = set(threading.enumerate())
+
+        with pytest.raises(RuntimeError, match="load failed"):
+            MongoToPostgres()._pipeline(
+                postgres_host="localhost",
+                postgres_port=5432,
+                postgres_database="postgres_test",
+                postgres_user="postgres",
+                postgres_password="postgres",
+                mongodb_host="localhost",
+                mongodb_port=27017,
+                mongodb_database="mydatabase",
+                mongodb_auth=False,
+                mongodb_collection="users",
+                mongodb_user="",
+                mongodb_password="",
+                mongodb_filter=None,
+                mongodb_aggregation_clause=None,
+                delta_date_columns=["loaddate"],
+                batch_size=1,
+                columns_to_drop=None,
+                columns_to_rename=None,
+                merge_ids=["_id"],
+                load_table="employees_pipeline",
+                load_schema="public",
+                load_database="postgres_test",
+                pipelined=True,
+                queue_size=1,
+            )
+
+        assert set(threading.enumerate()) == threads
+
+    def test_record_stage(self, obj):
+        obj.stage_stats = {}
+        obj._record_stage("load", 10, 2)
+        obj._record_stage("load", 30, 2)
+        assert obj.get_stats()["stages"]["load"] == {
+            "batches": 2,
+            "rows": 40,
+            "busy_time": 4,
+            "rows_per_second": 10,
+        }
+        assert obj._get_stage_rows("load") == 40
+        assert obj._get_stage_rows("extract") == 0
@@ -0,0 +1,127 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, too-few-public-methods. redefined-outer-name, protected-access, unused-import
+import time
+from threading import Lock
+from unittest.mock import MagicMock
+
+import pytest  # pylint: disable=import-error
+
+from ..src.pipeline.interface.pipeline_interface import PipelineInterface
+from ..src.pipeline.pipeline_runner import PipelineRunner
+
+
+class FakePipeline(PipelineInterface):
+    """
+    Pipeline loading the rows of its spec, tracking how many run at once
+    """
+
+    lock = Lock()
+    running = {}
+    max_running = {}
+    started = []
+
+    def run(self, **kwargs):
+        if kwargs.get("fail"):
+            raise ValueError("pipeline failed")
+
+        database = kwargs["postgres_database"]
+        with self.lock:
+            self.started.append(kwargs["pipeline_name"])
+            self.running[database] = self.running.get(database, 0) + 1
+            self.max_running[database] = max(
+                self.max_running.get(database, 0), self.running[database]
+            )
+        time.sleep(0.05)
+        with self.lock:
+            self.running[database] -= 1
+
+        self.number_of_rows_extracted = kwargs["rows"]
+        self.number_of_rows_transformed = kwargs["rows"]
+        self.number_of_rows_loaded = kwargs["rows"]
+        self._record_stage("load", kwargs["rows"], 1)
+        return "Pipeline ran successfully."
+
+    def _pipeline(self, **kwargs):
+        return True
+
+    def _get_pipeline_name(self, **kwargs):
+        return kwargs["pipeline_name"]
+
+
+def get_spec(name, database, rows, **kwargs):
+    return {
+        "pipeline_name": name,
+        "postgres_host": "localhost",
+        "postgres_port": 5432,
+        "postgres_user": "postgres",
+        "postgres_database": database,
+        "rows": rows,
+        **kwargs,
+    }
+
+
+@pytest.fixture
+def obj():
+    FakePipeline.max_running.clear()
+    FakePipeline.started.clear()
+    yield PipelineRunner(pipeline_class=FakePipeline)
+
+
+class TestPipelineRunner:
+    """
+    Testing the multi pipeline runner.
+    """
+
+    def test_run(self, obj):
+        specs = [get_spec(f"users_{i}", "first", 10) for i in range(4)]
+        specs.append(get_spec("orders", "second", 5))
+
+        obj.run(
+            pipelines=specs,
+            max_workers=5,
+            max_per_destination=2,
+            mongodb_client=MagicMock(),
+            postgres_pool=MagicMock(),
+        )
+
+        stats = obj.get_stats()
+        assert stats["number_of_rows_loaded"] == 45
+        assert stats["percentage_of_rows_loaded"] == 100
+        assert stats["stages"]["load"]["batches"] == 5
+        assert stats["pipelines"]["orders"]["number_of_rows_loaded"] == 5
+        assert FakePipeline.max_running["first"] == 2
+
+    def test_run_raises_after_all_pipelines(self, obj):
+        specs = [
+            get_spec("users", "first", 10, fail=True),
+            get_spec("orders", "first", 5),
+        ]
+
+        with pytest.raises(RuntimeError, match="users"):
+            obj.run(
+                pipelines=specs, mongodb_client=MagicMock(), postgres_pool=MagicMock()
+            )
+
+        assert obj.get_stats()["pipelines"]["orders"]["number_of_rows_loaded"] == 5
+
+    def test_full_destination_does_not_block_workers(self, obj):
+        specs = [get_spec(f"users_{i}", "first", 10) for i in range(3)]
+        specs.append(get_spec("orders", "second", 5))
+
+        obj.run(
+            pipelines=specs,
+            max_workers=2,
+            max_per_destination=1,
+            mongodb_client=MagicMock(),
+            postgres_pool=MagicMock(),
+        )
+
+        assert "orders" in FakePipeline.started[:2]
+        assert FakePipeline.max_running["first"] == 1
+
+    def test_get_destination_key(self, obj):
+        assert obj._get_destination_key(**get_spec("users", "first", 10)) == (
+            "localhost",
+            5432,
+            "postgres",
+            "first",
+        )
@@ -0,0 +1,98 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, too-few-public-methods. redefined-outer-name, protected-access, unused-import
+from datetime import datetime
+
+import pytest  # pylint: disable=import-error
+from bson.int64 import Int64  # pylint: disable=import-error
+
+from ..src.utils.schema_profiler import SchemaProfiler
+
+
+@pytest.fixture
+def obj():
+    yield SchemaProfiler()
+
+
+class TestSchemaProfiler:
+    """
+    Testing the single pass schema profiler.
+    """
+
+    def test_update(self, obj):
+        obj.update([{"id": 1, "name": "John"}, {"id": 2, "email": None}])
+        assert obj.get_columns() == {"id", "name", "email"}
+        assert obj.number_of_rows == 2
+        assert obj.get_python_types() == {
+            "id": [int],
+            "name": [str],
+            "email": [type(None)],
+        }
+
+    def test_update_incrementally(self, obj):
+        obj.update([{"id": 1, "created_at": None}])
+        obj.update([{"id": "2", "created_at": datetime(2023, 1, 1)}])
+        assert obj.number_of_rows == 2
+        assert obj.get_python_types() == {"id": [int, str], "created_at": [datetime]}
+
+    def test_get_python_types_for_columns(self, obj):
+        obj.update([{"id": 1, "name": "John"}])
+        assert obj.get_python_types(columns={"id", "missing"}) == {
+            "id": [int],
+            "missing": [],
+        }
+
+    def test_get_columns_stats(self, obj):
+        obj.update(
+            [
+                {"id": 3, "name": "John", "created_at": datetime(2023, 1, 1)},
+                {"id": -(2**40), "name": "Elizabeth", "created_at": None},
+            ]
+        )
+        assert obj.get_columns_stats() == {
+            "id": {"min": -(2**40), "max": 3},
+            "name": {"max_length": 9},
+            "created_at": {},
+        }
+        assert obj.get_columns_stats(columns={"missing"}) == {"missing": {}}
+
+    def test_get_columns_stats_of_int_subclasses(self, obj):
+        obj.update([{"id": Int64(2**40), "is_active": True}])
+        assert obj.get_columns_stats() == {"id": {"min": 2**40, "max": 2**40}}
+
+    def test_invalid_policy(self):
+        with pytest.raises(ValueError):
+            SchemaProfiler(policy="not_a_policy")
+
+    def test_first_n(self):
+        obj = SchemaProfiler(policy="first_n", sample_size=2)
+        obj.update([{"id": 1}, {"id": 2}, {"id": "3"}])
+        assert obj.number_of_rows == 3
+        assert obj.number_of_profiled_rows == 2
+        assert obj.get_python_types() == {"id": [int]}
+
+    def test_sampling_profiles_new_columns(self):
+        obj = SchemaProfiler(policy="first_n", sample_size=1)
+        obj.update([{"id": 1}, {"id": 2}])
+        obj.update([{"id": 3, "email": "jo@jo.com"}])
+        assert obj.get_python_types() == {"id": [int], "email": [str]}
+
+    def test_sampling_ignores_key_order(self):
+        obj = SchemaProfiler(policy="first_n", sample_size=1)
+        obj.update([{"a": 1, "b": 2}, {"b": "x", "a": "y"}, {"a": 3}])
+        assert obj.number_of_profiled_rows == 1
+        assert obj.get_python_types() == {"a": [int], "b": [int]}
+
+    def test_per_batch(self):
+        obj = SchemaProfiler(policy="per_batch", sample_size=1)
+        obj.update([{"id": 1}, {"id": "2"}])
+        obj.update([{"id": 1.5}, {"id": "4"}])
+        assert obj.get_python_types() == {"id": [int, float]}
+
+    def test_reservoir(self):
+        obj = SchemaProfiler(policy="reservoir", sample_size=10, seed=1)
+        obj.update([{"id": i} for i in range(1000)])
+        assert 10 < obj.number_of_profiled_rows < 1000
+
+    def test_update_without_sampling(self):
+        obj = SchemaProfiler(policy="first_n", sample_size=1)
+        obj.update([{"id": 1}, {"id": "2"}], sample=False)
+        assert obj.get_python_types() == {"id": [int, str]}
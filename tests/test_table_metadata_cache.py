@@ -0,0 +1,34 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring, too-few-public-methods. redefined-outer-name, protected-access, unused-import
+import pytest  # pylint: disable=import-error
+
+from ..src.utils.table_metadata_cache import TableMetadataCache
+
+METADATA = {
+    "columns": ["id", "email"],
+    "types": {"id": "integer", "email": "character varying(100)"},
+    "primary_key": ["id"],
+    "unique_keys": [["id"]],
+}
+
+
+class TestTableMetadataCache:
+    """
+    Testing the target table metadata cache.
+    """
+
+    def test_set_and_get(self):
+        cache = TableMetadataCache()
+        cache.set("public", "employees", METADATA)
+        assert cache.get("public", "employees") == METADATA
+        assert cache.get("public", "not_table") is None
+
+    def test_invalidate(self):
+        cache = TableMetadataCache()
+        cache.set("public", "employees", METADATA)
+        cache.invalidate("public", "employees")
+        assert cache.get("public", "employees") is None
+
+    def test_persist(self, tmp_path):
+        path = str(tmp_path / "metadata.json")
+        TableMetadataCache(path=path).set("public", "employees", METADATA)
+        assert TableMetadataCache(path=path).get("public", "employees") == METADATA
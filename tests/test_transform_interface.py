@@ -5,6 +5,7 @@ from .postgres.fixture_postgres import (
     fixture_load_data,
 )
 
+from ..src.transform.interface.transform_interface import treat_column_name
 from ..src.transform.transform_to_postgres import TransformPostgres
 
 
@@ -66,6 +67,42 @@ class TestTransformPostgres:
             "something_with_c_diactrics",
         }
 
+    def test_treat_column_name_is_cached(self, caplog):
+        treat_column_name.cache_clear()
+        with caplog.at_level("INFO"):
+            assert treat_column_name("order.$date") == "order_date"
+            assert treat_column_name("order.$date") == "order_date"
+            assert TransformPostgres()._get_treated_column_name("order.$date") == (
+                "order_date"
+            )
+
+        assert treat_column_name.cache_info().misses == 1
+        assert treat_column_name.cache_info().hits == 2
+        assert caplog.text.count("Remove .$date from column") == 1
+
+    def test_flatten_data(self, obj):
+        data = [{"a": {"x": 1, "y": {"z": 2, "w": {}}}, "b": 3}]
+        assert obj._flatten_data(data) == [{"a_x": 1, "a_y_z": 2, "a_y_w": {}, "b": 3}]
+        assert obj._flatten_data(data, max_depth=1, separator=".") == [
+            {"a.x": 1, "a.y": {"z": 2, "w": {}}, "b": 3}
+        ]
+        assert data == [{"a": {"x": 1, "y": {"z": 2, "w": {}}}, "b": 3}]
+
+    def test_apply_transform_plan_renamed_value_wins(self, obj):
+        for data in ([{"b": 1, "a": 2}], [{"a": 2, "b": 1}]):
+            columns, transformed = obj._apply_transform_plan(
+                data, columns_to_drop=[], columns_to_rename={"a": "b"}
+            )
+            assert columns == {"b"}
+            assert transformed == [{"b": 2}]
+
+        for data in ([{"a_b": 1, "a.b": 2}], [{"a.b": 2, "a_b": 1}]):
+            columns, transformed = obj._apply_transform_plan(
+                data, columns_to_drop=[], columns_to_rename={}
+            )
+            assert columns == {"a_b"}
+            assert transformed == [{"a_b": 2}]
+
     def test_get_python_types(self, obj):
         columns = {"id", "last_name", "email", "first_name", "create_date"}
         data = [
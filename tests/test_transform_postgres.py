@@ -33,3 +33,67 @@ class TestTransformPostgres:
         assert "first_name" not in data[0].keys()
         assert data[0]["customer_id"] == "5f8d4f8f9d6d7d0001c2d3a0"
         assert data[1]["customer_id"] == "5f8d4f8f9d6d7d0001c2d3a1"
+
+    def test_transform_plan_is_reused(self):
+        transformer = TransformPostgres()
+        data = [{"id": 1, "a.$oid": "x", "skip": 1}]
+        columns, transformed = transformer.transform(
+            data=data, columns_to_drop=["skip"], columns_to_rename={"id": "key"}
+        )
+        assert columns == {"key", "a_id"}
+        assert transformed == [{"key": 1, "a_id": "x"}]
+        assert data == [{"id": 1, "a.$oid": "x", "skip": 1}]
+
+        transformer.transform(
+            data=[{"id": 2, "new col": 1}],
+            columns_to_drop=["skip"],
+            columns_to_rename={"id": "key"},
+        )
+        assert transformer.transform_plans == {
+            (("skip",), (("id", "key"),)): {
+                "id": "key",
+                "a.$oid": "a_id",
+                "skip": None,
+                "new col": "new_col",
+            }
+        }
+
+    def test_transform_flatten(self, obj):
+        columns, data = obj.transform(
+            data=[{"id": 1, "address": {"city": "Rio", "geo": {"lat": 1}}, "blob": {}}],
+            columns_to_drop=["blob", "address_geo"],
+            columns_to_rename={"address_city": "city"},
+            flatten=True,
+        )
+        assert columns == {"id", "city"}
+        assert data == [{"id": 1, "city": "Rio"}]
+
+    def test_explode(self, obj):
+        data, children = obj.explode(
+            data=[
+                {"id": 1, "tags": ["a", "b"], "items": [{"sku.code": "x"}]},
+                {"id": 2, "tags": []},
+            ],
+            arrays_to_explode=["tags", "items"],
+            merge_ids=["id"],
+        )
+        assert data == [{"id": 1}, {"id": 2}]
+        assert children == {
+            "tags": [
+                {"value": "a", "id": 1, "position": 0},
+                {"value": "b", "id": 1, "position": 1},
+            ],
+            "items": [{"sku_code": "x", "id": 1, "position": 0}],
+        }
+
+    def test_explode_keeps_last_parent(self, obj):
+        _, children = obj.explode(
+            data=[{"id": 1, "tags": ["a", "b"]}, {"id": 1, "tags": ["c"]}],
+            arrays_to_explode=["tags"],
+            merge_ids=["id"],
+        )
+        assert children == {"tags": [{"value": "c", "id": 1, "position": 0}]}
+
+    def test_explode_without_merge_ids(self, obj):
+        with pytest.raises(ValueError):
+            obj.explode(data=[{"tags": []}], arrays_to_explode=["tags"], merge_ids=None)